@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QS排名跨年份分析脚本
+功能：一次遍历 data/raw/merge 下所有年份的合并数据，建立每所大学的排名时间序列索引，
+同时统计各年份的分数分布和各地区汇总，之后的名次变化、进步/退步最多的大学等查询都基于索引完成
+"""
+
+import argparse
+import json
+import math
+from pathlib import Path
+
+from qs_io import iter_records, list_data_files, strip_format_suffix
+from rank_table import UNRANKED, parse_rank, parse_score
+
+
+# 分数分布直方图的默认区间宽度
+DEFAULT_BIN_WIDTH = 10
+
+# 默认列出进步/退步最多的大学数量
+DEFAULT_TOP = 10
+
+
+def get_university_key(university):
+    """
+    大学在各年份间保持不变的标识：优先使用core_id，没有时使用英文名
+    """
+    core_id = university.get('core_id')
+    if core_id:
+        return f"id:{core_id}"
+    return f"title:{university.get('title', '').strip().lower()}"
+
+
+class RankingTimeSeries:
+    """
+    各大学的排名时间序列索引
+
+    遍历数据时同时完成：
+        universities: {标识: {'title', 'country', 'region', 'years': {年份: {'rank', 'rank_low', 'score'}}}}
+        histograms: {年份: {区间起点: 大学数}}，只统计有具体分数的大学
+        regions: {年份: {地区: {'count', 'scored', 'score_sum', 'best_rank', 'best_title'}}}
+
+    用法：
+        series = RankingTimeSeries()
+        for year, universities in ...:
+            series.add_year(year, universities)
+        series.top_movers('2024', '2025')
+    """
+
+    def __init__(self, bin_width=DEFAULT_BIN_WIDTH):
+        """
+        Args:
+            bin_width (int): 分数分布直方图的区间宽度
+        """
+        self.bin_width = bin_width
+        self.years = []
+        self.universities = {}
+        self.histograms = {}
+        self.regions = {}
+
+    def add_year(self, year, universities):
+        """
+        把某一年的数据加入索引
+        先在局部变量中统计，整年的数据都读完后才合并到索引中，读取中途出错时索引保持不变
+
+        Args:
+            year (str): 年份
+            universities (iterable): 该年份的大学数据，可以是生成器
+        """
+        histogram = {}
+        regions = {}
+        # [(标识, 名称, 国家/地区, 所在地区, 该年份的名次和分数)]
+        year_entries = []
+
+        for university in universities:
+            rank = university.get('rank', '')
+            rank_low = parse_rank(rank)[0]
+            score = parse_score(university.get('overall_score'))
+            title = university.get('title', '')
+            region = university.get('region') or '未知'
+            year_entries.append((get_university_key(university), title, university.get('country', ''), region,
+                                 {'rank': rank, 'rank_low': rank_low, 'score': score}))
+
+            if not math.isnan(score):
+                bin_start = int(score // self.bin_width * self.bin_width)
+                histogram[bin_start] = histogram.get(bin_start, 0) + 1
+
+            stats = regions.setdefault(region, {
+                'count': 0, 'scored': 0, 'score_sum': 0.0, 'best_rank': UNRANKED, 'best_title': ''
+            })
+            stats['count'] += 1
+            if not math.isnan(score):
+                stats['scored'] += 1
+                stats['score_sum'] += score
+            if rank_low < stats['best_rank']:
+                stats['best_rank'] = rank_low
+                stats['best_title'] = title
+
+        for key, title, country, region, year_data in year_entries:
+            entry = self.universities.setdefault(key, {
+                'title': title,
+                'country': country,
+                'region': region,
+                'years': {}
+            })
+            # 名称、国家/地区以最近一年的数据为准
+            if year >= max(entry['years'], default=year):
+                entry.update(title=title, country=country, region=region)
+            entry['years'][year] = year_data
+
+        if year not in self.years:
+            self.years.append(year)
+            self.years.sort()
+        self.histograms[year] = histogram
+        self.regions[year] = regions
+
+    def rank_deltas(self, from_year, to_year):
+        """
+        两个年份之间的名次变化，只包含两年都有具体名次的大学
+
+        Returns:
+            list: [(标识, 名次提升数), ...]，正数表示名次上升；区间排名按区间起点计算
+        """
+        deltas = []
+        for key, entry in self.universities.items():
+            before = entry['years'].get(from_year)
+            after = entry['years'].get(to_year)
+            if not before or not after:
+                continue
+            if before['rank_low'] == UNRANKED or after['rank_low'] == UNRANKED:
+                continue
+            deltas.append((key, before['rank_low'] - after['rank_low']))
+        return deltas
+
+    def top_movers(self, from_year, to_year, limit=DEFAULT_TOP):
+        """
+        名次上升和下降最多的大学
+
+        Returns:
+            tuple: (上升最多的列表, 下降最多的列表)，每项为 (标识, 名次提升数)
+        """
+        deltas = self.rank_deltas(from_year, to_year)
+        risers = sorted((item for item in deltas if item[1] > 0), key=lambda item: -item[1])[:limit]
+        fallers = sorted((item for item in deltas if item[1] < 0), key=lambda item: item[1])[:limit]
+        return risers, fallers
+
+    def new_entries(self, from_year, to_year):
+        """to_year新上榜（from_year没有数据）的大学"""
+        return [key for key, entry in self.universities.items()
+                if to_year in entry['years'] and from_year not in entry['years']]
+
+    def score_histogram(self, year):
+        """
+        某一年的分数分布
+
+        Returns:
+            list: [(区间起点, 大学数), ...]，按区间起点排序
+        """
+        return sorted(self.histograms.get(year, {}).items())
+
+    def region_summary(self, year):
+        """
+        某一年各地区的汇总
+
+        Returns:
+            list: [(地区, {'count', 'average_score', 'best_rank', 'best_title'}), ...]，按大学数降序
+        """
+        summary = []
+        for region, stats in self.regions.get(year, {}).items():
+            summary.append((region, {
+                'count': stats['count'],
+                'average_score': round(stats['score_sum'] / stats['scored'], 2) if stats['scored'] else None,
+                'best_rank': stats['best_rank'] if stats['best_rank'] != UNRANKED else None,
+                'best_title': stats['best_title']
+            }))
+        return sorted(summary, key=lambda item: -item[1]['count'])
+
+    def history(self, key):
+        """某所大学各年份的排名，[(年份, 排名), ...]"""
+        entry = self.universities[key]
+        return [(year, entry['years'][year]['rank']) for year in sorted(entry['years'])]
+
+    def build_report(self, from_year, to_year, limit=DEFAULT_TOP):
+        """
+        生成可导出为JSON的完整报告
+        """
+        def describe(key, delta):
+            entry = self.universities[key]
+            return {
+                'title': entry['title'],
+                'country': entry['country'],
+                'from_rank': entry['years'][from_year]['rank'],
+                'to_rank': entry['years'][to_year]['rank'],
+                'delta': delta
+            }
+
+        risers, fallers = self.top_movers(from_year, to_year, limit)
+        return {
+            'years': self.years,
+            'from_year': from_year,
+            'to_year': to_year,
+            'universities': len(self.universities),
+            'risers': [describe(key, delta) for key, delta in risers],
+            'fallers': [describe(key, delta) for key, delta in fallers],
+            'new_entries': len(self.new_entries(from_year, to_year)),
+            'score_histogram': {year: dict(self.score_histogram(year)) for year in self.years},
+            'regions': {year: dict(self.region_summary(year)) for year in self.years}
+        }
+
+
+def load_time_series(merge_dir, bin_width=DEFAULT_BIN_WIDTH):
+    """
+    读取所有年份的合并数据并建立索引，每个文件只流式读取一次
+
+    Args:
+        merge_dir (Path): 合并数据目录
+        bin_width (int): 分数分布直方图的区间宽度
+
+    Returns:
+        RankingTimeSeries: 索引
+    """
+    series = RankingTimeSeries(bin_width)
+    for merge_file in list_data_files(merge_dir):
+        year = strip_format_suffix(merge_file)
+        try:
+            series.add_year(year, iter_records(merge_file))
+        except Exception as e:
+            print(f"读取文件 {merge_file} 时出错: {e}")
+    return series
+
+
+def print_report(series, from_year, to_year, limit=DEFAULT_TOP):
+    """打印分析报告"""
+    print("QS排名跨年份分析报告")
+    print("=" * 60)
+    print(f"年份: {', '.join(series.years)}，共 {len(series.universities)} 所大学")
+
+    risers, fallers = series.top_movers(from_year, to_year, limit)
+    for label, movers in (("名次上升", risers), ("名次下降", fallers)):
+        print(f"\n{from_year} -> {to_year} {label}最多的{limit}所大学:")
+        for key, delta in movers:
+            entry = series.universities[key]
+            print(f"  {delta:+5d}  {entry['years'][from_year]['rank']:>8} -> {entry['years'][to_year]['rank']:<8} "
+                  f"{entry['title']} ({entry['country']})")
+    print(f"\n{to_year}年新上榜: {len(series.new_entries(from_year, to_year))} 所大学")
+
+    print(f"\n{to_year}年分数分布:")
+    histogram = series.score_histogram(to_year)
+    max_count = max((count for _, count in histogram), default=0)
+    for bin_start, count in histogram:
+        bar = '█' * max(1, round(count / max_count * 40))
+        print(f"  {bin_start:>3}-{bin_start + series.bin_width:<3} {count:>5} {bar}")
+
+    print(f"\n{to_year}年各地区汇总:")
+    for region, stats in series.region_summary(to_year):
+        average = f"{stats['average_score']:.2f}" if stats['average_score'] is not None else '-'
+        print(f"  {region:<20} {stats['count']:>5} 所  平均分 {average:>6}  "
+              f"最高排名 {stats['best_rank'] or '-'} {stats['best_title']}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='QS排名跨年份分析：名次变化、进步/退步最多的大学、分数分布、地区汇总')
+    parser.add_argument('--from', dest='from_year', help='比较的起始年份（默认倒数第二个年份）')
+    parser.add_argument('--to', dest='to_year', help='比较的结束年份（默认最近的年份）')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help=f'列出的大学数量（默认{DEFAULT_TOP}）')
+    parser.add_argument('--bin-width', type=int, default=DEFAULT_BIN_WIDTH,
+                        help=f'分数分布的区间宽度（默认{DEFAULT_BIN_WIDTH}）')
+    parser.add_argument('--json', dest='json_file', help='把完整报告导出为JSON文件')
+    args = parser.parse_args()
+
+    merge_dir = Path(__file__).parent / "data" / "raw" / "merge"
+    if not merge_dir.exists():
+        print(f"合并数据目录 {merge_dir} 不存在，请先运行 merge_data.py")
+        return
+
+    series = load_time_series(merge_dir, args.bin_width)
+    if len(series.years) < 2 and not (args.from_year and args.to_year):
+        print("至少需要两个年份的数据才能比较")
+        return
+
+    from_year = args.from_year or series.years[-2]
+    to_year = args.to_year or series.years[-1]
+    for year in (from_year, to_year):
+        if year not in series.years:
+            print(f"没有 {year} 年的数据，可选年份: {', '.join(series.years)}")
+            return
+
+    print_report(series, from_year, to_year, args.top)
+
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as f:
+            json.dump(series.build_report(from_year, to_year, args.top), f, ensure_ascii=False, indent=2)
+        print(f"\n完整报告已导出到 {args.json_file}")
+
+
+if __name__ == "__main__":
+    main()
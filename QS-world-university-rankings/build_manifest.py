@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量构建清单
+功能：记录每个处理阶段、每个年份的输入/输出文件指纹，输入没有变化且输出完好时跳过该年份
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+# 脚本所在目录，清单中的路径都相对于这个目录保存
+SCRIPT_DIR = Path(__file__).parent
+MANIFEST_PATH = SCRIPT_DIR / "data" / "build_manifest.json"
+
+
+def hash_file(file_path):
+    """计算文件的SHA-256"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def hash_data(data):
+    """计算任意可JSON序列化数据的SHA-256，用于记录影响输出的参数（如翻译映射表）"""
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class BuildManifest:
+    """
+    增量构建清单
+
+    文件指纹包括大小、修改时间和SHA-256。判断文件是否变化时，大小和修改时间都没变就认为没变，
+    否则再比较SHA-256，这样只是被touch过的文件不会触发重建。
+
+    用法：
+        manifest = BuildManifest()
+        if not manifest.is_up_to_date('merge', year, slice_files, [output_file]):
+            ...  # 重新生成output_file
+            manifest.record('merge', year, slice_files, [output_file])
+        manifest.save()
+    """
+
+    def __init__(self, path=None, force=False):
+        """
+        Args:
+            path (str): 清单文件路径
+            force (bool): 为True时所有年份都视为需要重建
+        """
+        self.path = Path(path or MANIFEST_PATH)
+        self.force = force
+        self.stages = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.stages = json.load(f).get('stages', {})
+            except Exception as e:
+                print(f"读取构建清单 {self.path} 失败，将全部重建: {e}")
+
+    @staticmethod
+    def relpath(file_path):
+        """清单中保存的路径"""
+        return Path(os.path.relpath(os.path.abspath(file_path), SCRIPT_DIR)).as_posix()
+
+    @staticmethod
+    def fingerprint(file_path, previous=None):
+        """
+        计算文件指纹，大小和修改时间与previous一致时沿用之前的SHA-256
+
+        Returns:
+            dict or None: {'size', 'mtime', 'sha256'}，文件不存在时返回None
+        """
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime:
+            return previous
+        return {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': hash_file(file_path)}
+
+    def files_match(self, recorded, file_paths):
+        """文件列表与记录的指纹是否完全一致"""
+        paths = [self.relpath(file_path) for file_path in file_paths]
+        if sorted(paths) != sorted(recorded):
+            return False
+        for path, file_path in zip(paths, file_paths):
+            if recorded[path] is None:
+                return False
+            current = self.fingerprint(file_path, recorded[path])
+            if current is None or current['sha256'] != recorded[path]['sha256']:
+                return False
+            # 内容没变只是修改时间变了，更新记录，下次不用再计算SHA-256
+            recorded[path] = current
+        return True
+
+    def is_up_to_date(self, stage, key, inputs, outputs, params=None):
+        """
+        判断某个阶段的某个年份是否需要重建
+
+        Args:
+            stage (str): 阶段名，如 'merge'
+            key (str): 年份
+            inputs (list): 输入文件
+            outputs (list): 输出文件
+            params: 影响输出的其他参数，变化时也需要重建
+
+        Returns:
+            bool: 输入和参数都没变且输出完好时返回True
+        """
+        if self.force:
+            return False
+        entry = self.stages.get(stage, {}).get(str(key))
+        if not entry:
+            return False
+        if entry.get('params') != (hash_data(params) if params is not None else None):
+            return False
+        return self.files_match(entry['inputs'], inputs) and self.files_match(entry['outputs'], outputs)
+
+    def record(self, stage, key, inputs, outputs, params=None):
+        """记录某个阶段的某个年份构建完成时的输入/输出指纹"""
+        self.stages.setdefault(stage, {})[str(key)] = {
+            'inputs': {self.relpath(file_path): self.fingerprint(file_path) for file_path in inputs},
+            'outputs': {self.relpath(file_path): self.fingerprint(file_path) for file_path in outputs},
+            'params': hash_data(params) if params is not None else None
+        }
+
+    def forget(self, stage, key):
+        """删除某个阶段的某个年份的记录"""
+        self.stages.get(stage, {}).pop(str(key), None)
+
+    def keys(self, stage):
+        """某个阶段已记录的所有年份"""
+        return list(self.stages.get(stage, {}))
+
+    def save(self):
+        """写回清单文件"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'stages': self.stages}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
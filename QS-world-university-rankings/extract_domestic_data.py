@@ -2,125 +2,192 @@
 # -*- coding: utf-8 -*-
 """
 提取国内大学数据脚本
-功能：从合并后的数据中提取中国大陆、香港、澳门、台湾的大学数据
+功能：从合并后的数据中提取中国大陆、香港、澳门、台湾的大学数据，
+可以在同一次遍历中按 record_filter 中的其他过滤器（如 asia、top500）输出更多子集到 data/subsets/{过滤器名}/
 """
 
-import json
-import os
+import sys
+from contextlib import ExitStack
 from pathlib import Path
 
+from build_manifest import BuildManifest
+from parallel import DEFAULT_JOBS, get_jobs_option, map_years
+from qs_io import JsonArrayWriter, iter_records, list_data_files, strip_format_suffix
+from record_filter import compile_filter, compile_filters, load_filter_specs, split_records
 
-def parse_merge_file(file_path):
+
+# 国内大学所在的国家/地区
+DOMESTIC_COUNTRIES = {
+    "China (Mainland)",
+    "Hong Kong SAR", 
+    "Macau SAR",
+    "Taiwan"
+}
+
+# 国内大学的过滤条件，输出到 data/parsed
+DOMESTIC_FILTER = {"country": sorted(DOMESTIC_COUNTRIES)}
+DOMESTIC_FILTER_NAME = "domestic"
+
+domestic_filter = compile_filter(DOMESTIC_FILTER)
+
+
+def is_domestic_university(university):
     """
-    解析合并后的文件内容
+    是否是国内大学（中国大陆、香港、澳门、台湾）
     
     Args:
-        file_path (str): 文件路径，如 data/raw/merge/2022.json
+        university (dict): 大学数据
         
     Returns:
-        list: 解析后的大学数据列表
+        bool: 是否是国内大学
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        print(f"解析文件 {file_path} 时出错: {e}")
-        return []
+    return domestic_filter(university)
 
 
-def filter_domestic_universities(universities):
+def get_subsets_option(argv, specs):
     """
-    过滤出国内大学（中国大陆、香港、澳门、台湾）
+    从命令行参数中取出 --subsets 的值
     
     Args:
-        universities (list): 大学数据列表
+        argv (list): 命令行参数
+        specs (dict): 所有可用的过滤器
         
     Returns:
-        list: 符合条件的国内大学数据
+        list: 需要额外输出的子集名，--subsets all 表示全部，没有指定时返回空列表
     """
-    domestic_countries = [
-        "China (Mainland)",
-        "Hong Kong SAR", 
-        "Macau SAR",
-        "Taiwan"
-    ]
-    
-    domestic_universities = []
-    
-    for university in universities:
-        if 'country' in university and university['country'] in domestic_countries:
-            domestic_universities.append(university)
-    
-    return domestic_universities
+    if '--subsets' not in argv:
+        return []
+    index = argv.index('--subsets')
+    value = argv[index + 1] if index + 1 < len(argv) else ''
+    names = list(specs) if value == 'all' else [name for name in value.split(',') if name]
+    unknown_names = [name for name in names if name not in specs]
+    if not names or unknown_names:
+        raise ValueError(f"未知的子集: {', '.join(unknown_names) or value}，可选: {', '.join(specs)}, all")
+    # 提前编译一次，过滤条件写错时在开始处理前报错
+    for name in names:
+        compile_filter(specs[name])
+    return names
 
 
-def save_domestic_data(domestic_universities, output_file):
+def extract_year(task):
     """
-    保存国内大学数据到文件
+    一次遍历合并文件，提取单个年份的国内大学数据和其他子集，可以在子进程中执行
     
     Args:
-        domestic_universities (list): 国内大学数据列表
-        output_file (str): 输出文件路径
+        task (tuple): (合并文件路径, {过滤器名: (过滤条件, 输出文件路径)})，国内大学使用 DOMESTIC_FILTER_NAME
+        
+    Returns:
+        tuple or None: (原始大学数, {过滤器名: 满足条件的大学数})，合并文件没有数据或处理失败时返回None
     """
+    merge_file, outputs = task
+    # 过滤器在子进程中编译，编译后的函数不需要跨进程传递
+    filters = compile_filters({name: spec for name, (spec, _) in outputs.items()})
+    
+    total_count = 0
     try:
-        # 确保输出目录存在
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(domestic_universities, f, ensure_ascii=False, indent=2)
-        
-        print(f"成功保存 {len(domestic_universities)} 所国内大学数据到 {output_file}")
+        with ExitStack() as stack:
+            writers = {name: stack.enter_context(JsonArrayWriter(output_file))
+                       for name, (_, output_file) in outputs.items()}
+            for university, names in split_records(iter_records(merge_file), filters):
+                total_count += 1
+                for name in names:
+                    writers[name].write(university)
     except Exception as e:
-        print(f"保存文件 {output_file} 时出错: {e}")
+        print(f"处理文件 {merge_file} 时出错: {e}")
+        return None
+    
+    if not total_count:
+        # 没有数据的年份不生成输出文件
+        for _, output_file in outputs.values():
+            Path(output_file).unlink()
+        return None
+    
+    for name, writer in writers.items():
+        print(f"成功保存 {writer.count} 所大学数据（{name}）到 {writer.output_file}")
+    return total_count, {name: writer.count for name, writer in writers.items()}
 
 
-def process_all_merge_files():
+def process_all_merge_files(force=False, jobs=DEFAULT_JOBS, subsets=()):
     """
     处理所有合并后的文件，提取国内大学数据
+    合并文件没有变化的年份直接跳过
+    
+    Args:
+        force (bool): 是否忽略构建清单，重新处理所有年份
+        jobs (int): 同时处理的年份数（进程数）
+        subsets (list): 同一次遍历中额外输出的子集名，见 record_filter.load_filter_specs
     """
     # 获取脚本文件所在目录，然后构建数据目录的相对路径
     script_dir = Path(__file__).parent
     merge_dir = script_dir / "data" / "raw" / "merge"
     parsed_dir = script_dir / "data" / "parsed"
+    subsets_dir = script_dir / "data" / "subsets"
     
     if not merge_dir.exists():
         print(f"合并数据目录 {merge_dir} 不存在")
         return
     
-    # 遍历所有合并后的文件
-    for merge_file in merge_dir.glob("*.json"):
-        print(f"处理文件: {merge_file}")
+    manifest = BuildManifest(force=force)
+    specs = load_filter_specs()
+    # 过滤条件变化时需要重新过滤
+    selected_specs = {DOMESTIC_FILTER_NAME: DOMESTIC_FILTER, **{name: specs[name] for name in subsets}}
+    
+    def get_outputs(year):
+        outputs = {DOMESTIC_FILTER_NAME: (DOMESTIC_FILTER, parsed_dir / f"{year}.json")}
+        for name in subsets:
+            outputs[name] = (specs[name], subsets_dir / name / f"{year}.json")
+        return outputs
+    
+    # 遍历所有合并后的文件，找出需要处理的年份
+    tasks = []
+    for merge_file in list_data_files(merge_dir):
+        # 生成输出文件名，合并文件可能是其他格式，过滤后的数据统一保存为JSON
+        year = strip_format_suffix(merge_file)
+        output_files = [output_file for _, output_file in get_outputs(year).values()]
         
-        # 解析文件内容
-        universities = parse_merge_file(merge_file)
-        if not universities:
+        if manifest.is_up_to_date('extract', year, [merge_file], output_files, selected_specs):
+            print(f"{merge_file.name} 没有变化，跳过")
             continue
         
-        # 过滤国内大学
-        domestic_universities = filter_domestic_universities(universities)
-        
-        # 生成输出文件名
-        output_file = parsed_dir / merge_file.name
-        
-        # 保存国内大学数据
-        save_domestic_data(domestic_universities, output_file)
+        print(f"处理文件: {merge_file}")
+        tasks.append((merge_file, get_outputs(year)))
+    
+    # 各年份互不依赖，可以并行处理，结果按年份顺序汇总
+    for (merge_file, outputs), result in zip(tasks, map_years(extract_year, tasks, jobs)):
+        if result is None:
+            continue
+        output_files = [output_file for _, output_file in outputs.values()]
+        manifest.record('extract', strip_format_suffix(merge_file), [merge_file], output_files, selected_specs)
         
         # 打印统计信息
-        print(f"原始数据: {len(universities)} 所大学")
-        print(f"国内大学: {len(domestic_universities)} 所大学")
-        print(f"输出文件: {output_file}")
+        total_count, counts = result
+        print(f"{merge_file.name}:")
+        print(f"原始数据: {total_count} 所大学")
+        print(f"国内大学: {counts[DOMESTIC_FILTER_NAME]} 所大学")
+        for name in subsets:
+            print(f"{name}: {counts[name]} 所大学")
+        print(f"输出文件: {outputs[DOMESTIC_FILTER_NAME][1]}")
         print("-" * 50)
+    
+    manifest.save()
 
 
 def main():
     """
     主函数
     """
+    try:
+        jobs = get_jobs_option(sys.argv)
+        subsets = get_subsets_option(sys.argv, load_filter_specs())
+    except ValueError as e:
+        print(f"错误：{e}")
+        return
+    
     print("开始提取国内大学数据...")
-    process_all_merge_files()
+    # --force 忽略构建清单重新处理所有年份，--jobs 指定同时处理的年份数，--subsets 同时输出其他子集
+    process_all_merge_files(force='--force' in sys.argv, jobs=jobs, subsets=subsets)
     print("数据提取完成！")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QS排名接口抓取脚本
+功能：根据年份和对应的接口nid，并发抓取所有分页，直接写成 data/raw/slice/{年份}-{序号}.json 切片文件，
+供 merge_data.py 合并。已下载的有效切片会被跳过，中断后重新运行即可继续。
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.http import HttpClient
+from utils.pagination import PageCrawler
+from utils.rate_limit import RateLimiter
+
+
+ENDPOINT_URL = "https://www.topuniversities.com/rankings/endpoint"
+
+# 排名页面，作为Referer
+RANKING_PAGE_URL = "https://www.topuniversities.com/world-university-rankings"
+
+# 接口每页最多返回的条数
+DEFAULT_ITEMS_PER_PAGE = 500
+
+# 每个年份同时在途的页面数
+DEFAULT_CONCURRENCY = 4
+
+# 每秒最多请求数，所有年份共用
+DEFAULT_RATE = 1.0
+
+# 与网页中分页请求一致的查询参数，筛选条件都为空
+DEFAULT_PARAMS = {
+    'tab': 'indicators', 'region': '', 'countries': '', 'cities': '', 'search': '', 'star': '',
+    'sort_by': '', 'order_by': '', 'program_type': '', 'scholarship': '', 'fee': '',
+    'english_score': '', 'academic_score': '', 'mix_student': ''
+}
+
+SLICE_DIR = Path(__file__).parent / "data" / "raw" / "slice"
+
+
+def parse_year_nid(value):
+    """
+    解析命令行中的 年份=nid
+
+    Returns:
+        tuple: (年份, nid)
+    """
+    year, sep, nid = value.partition('=')
+    if not sep or not (year.isdigit() and len(year) == 4) or not nid.strip():
+        raise argparse.ArgumentTypeError(f"格式应为 年份=nid，如 2024=3740566: {value}")
+    return year, nid.strip()
+
+
+def get_slice_file(slice_dir, year, page, items_per_page):
+    """
+    第page页（从0开始）对应的切片文件，序号为该页最后一条的位置，如第0页 -> 2022-500.json
+    """
+    return slice_dir / f"{year}-{(page + 1) * items_per_page}.json"
+
+
+def load_slice_nodes(slice_file):
+    """
+    读取已下载的切片文件中的score_nodes
+
+    Returns:
+        list or None: 文件不存在、解析失败或没有数据时返回None
+    """
+    if not slice_file.exists():
+        return None
+    try:
+        with open(slice_file, 'r', encoding='utf-8') as f:
+            nodes = json.load(f).get('score_nodes')
+    except Exception as e:
+        print(f"切片文件 {slice_file} 无效，将重新下载: {e}")
+        return None
+    return nodes or None
+
+
+def write_slice_file(slice_file, content):
+    """先写临时文件再重命名，中断时不会留下不完整的切片"""
+    tmp_file = slice_file.with_name(slice_file.name + '.tmp')
+    tmp_file.write_bytes(content)
+    os.replace(tmp_file, slice_file)
+
+
+def find_total_pages(data, items_per_page):
+    """
+    从响应中解析总页数，接口没有返回总数时返回None
+
+    Returns:
+        int or None: 总页数
+    """
+    total_pages = data.get('total_pages')
+    if total_pages is not None:
+        return int(total_pages)
+    total_record = data.get('total_record', data.get('total_records'))
+    if total_record is not None:
+        return math.ceil(int(total_record) / items_per_page)
+    return None
+
+
+class YearFetcher:
+    """
+    抓取某一年的所有分页
+
+    接口的页码从0开始。第一页的响应中带有总数时直接并发抓取其余页面，
+    否则向后抓取直到遇到没有数据的页面。
+    """
+
+    def __init__(self, year, nid, client, rate_limiter, slice_dir=SLICE_DIR,
+                 items_per_page=DEFAULT_ITEMS_PER_PAGE, concurrency=DEFAULT_CONCURRENCY, force=False):
+        """
+        Args:
+            year (str): 年份
+            nid (str): 该年份排名在接口中的nid
+            client (HttpClient): 共用的HTTP客户端
+            rate_limiter (RateLimiter): 共用的限速器
+            slice_dir (Path): 切片文件目录
+            items_per_page (int): 每页条数
+            concurrency (int): 同时在途的页面数
+            force (bool): 是否忽略已下载的切片，全部重新下载
+        """
+        self.year = year
+        self.nid = nid
+        self.slice_dir = slice_dir
+        self.items_per_page = items_per_page
+        self.force = force
+        self.downloaded = 0
+        self.skipped = 0
+        self.crawler = PageCrawler(
+            url_for_page=self.get_page_url,
+            parse_page=self.save_page,
+            find_last_page=self.find_last_page,
+            client=client,
+            rate_limiter=rate_limiter,
+            concurrency=concurrency,
+            first_page=0,
+            load_local_page=None if force else self.load_local_page
+        )
+
+    def get_page_url(self, page):
+        """第page页的请求URL"""
+        params = {'nid': self.nid, 'page': page, 'items_per_page': self.items_per_page, **DEFAULT_PARAMS}
+        return HttpClient.build_url(ENDPOINT_URL, params)
+
+    def load_local_page(self, page):
+        """已下载过的页面直接使用本地切片"""
+        nodes = load_slice_nodes(get_slice_file(self.slice_dir, self.year, page, self.items_per_page))
+        if nodes is not None:
+            self.skipped += 1
+        return nodes
+
+    def save_page(self, response, page):
+        """校验响应并原样保存为切片文件，返回该页的score_nodes"""
+        data = response.json()
+        nodes = data.get('score_nodes')
+        if not nodes:
+            return []
+        write_slice_file(get_slice_file(self.slice_dir, self.year, page, self.items_per_page), response.content)
+        self.downloaded += 1
+        return nodes
+
+    def find_last_page(self, response):
+        """从第一页的响应中解析最后一页的页码"""
+        total_pages = find_total_pages(response.json(), self.items_per_page)
+        return total_pages - 1 if total_pages is not None else None
+
+    async def fetch(self):
+        """
+        抓取所有页面
+
+        Returns:
+            int: 该年份的大学数
+        """
+        rows = await self.crawler.collect()
+        print(f"{self.year}: {len(rows)} 所大学，新下载 {self.downloaded} 页，跳过已有的 {self.skipped} 页")
+        if self.crawler.failed_pages:
+            print(f"{self.year}: 以下页面抓取失败，重新运行可继续下载: {sorted(self.crawler.failed_pages)}")
+        return len(rows)
+
+
+async def fetch_all(fetchers):
+    """所有年份同时抓取，共用限速器，总速率不超过设置"""
+    return await asyncio.gather(*(fetcher.fetch() for fetcher in fetchers))
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='并发抓取QS排名接口，生成 data/raw/slice 下的切片文件')
+    parser.add_argument('years', nargs='+', type=parse_year_nid, metavar='年份=nid',
+                        help='要抓取的年份及其接口nid（在排名页面的分页请求中查看），如 2024=3740566')
+    parser.add_argument('--items-per-page', type=int, default=DEFAULT_ITEMS_PER_PAGE,
+                        help=f'每页条数（默认{DEFAULT_ITEMS_PER_PAGE}），决定切片文件名中的序号')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'每个年份同时抓取的页面数（默认{DEFAULT_CONCURRENCY}）')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'每秒最多请求数（默认{DEFAULT_RATE:g}）')
+    parser.add_argument('--cookie', help='请求时带上的Cookie，接口拒绝访问时从浏览器中复制')
+    parser.add_argument('--force', action='store_true', help='忽略已下载的切片，全部重新下载')
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    SLICE_DIR.mkdir(parents=True, exist_ok=True)
+
+    headers = {'Accept': 'application/json, text/plain, */*', 'Referer': RANKING_PAGE_URL}
+    if args.cookie:
+        headers['Cookie'] = args.cookie
+    years = dict(args.years)
+    client = HttpClient(headers=headers, pool_maxsize=args.concurrency * len(years))
+    rate_limiter = RateLimiter(rate=args.rate)
+
+    fetchers = [
+        YearFetcher(year, nid, client, rate_limiter, slice_dir=SLICE_DIR, items_per_page=args.items_per_page,
+                    concurrency=args.concurrency, force=args.force)
+        for year, nid in years.items()
+    ]
+
+    print(f"开始抓取 {', '.join(years)} 年的数据（每年并发数 {args.concurrency}，每秒最多 {args.rate:g} 个请求）...")
+    counts = asyncio.run(fetch_all(fetchers))
+
+    print(f"\n共 {sum(counts)} 条记录，切片文件保存在 {SLICE_DIR}")
+    if any(fetcher.crawler.failed_pages for fetcher in fetchers):
+        print("部分页面抓取失败，重新运行同样的命令会跳过已下载的页面")
+    else:
+        print("接下来运行 merge_data.py 合并数据")
+
+
+if __name__ == "__main__":
+    main()
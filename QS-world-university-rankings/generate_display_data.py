@@ -2,21 +2,136 @@
 # -*- coding: utf-8 -*-
 """
 生成展示数据脚本
-功能：从data/parsed目录下的*_with_chinese.json文件中提取展示所需的字段，生成统一的展示数据文件
+功能：从data/parsed目录下的*_with_chinese.json文件中提取展示所需的字段，生成统一的展示数据文件，
+同时按年份拆分成 data/display/years/{年份}.json 分片和 data/display/index.json 索引，供页面按需加载
 """
 
+import gzip
+import hashlib
 import json
 import os
 from pathlib import Path
 
+try:
+    # 可选依赖：安装后额外生成brotli压缩的分片
+    import brotli
+except ImportError:
+    brotli = None
 
-def generate_display_data():
+from build_manifest import BuildManifest
+from parallel import DEFAULT_JOBS, get_jobs_option, map_years
+from qs_io import (DEFAULT_FORMAT, detect_format, find_data_file, get_format_option, load_records, open_writer,
+                   remove_other_formats, with_format)
+from rank_table import RankTable
+from search_index import save_search_index
+
+
+def to_display_item(university, year):
+    """
+    提取展示所需的字段
+    
+    Args:
+        university (dict): 带中文名的大学数据
+        year (str): 年份
+        
+    Returns:
+        dict or None: 展示数据，没有中文名的返回None
+    """
+    # 提取所需字段
+    title_zh = university.get('title_zh')
+    rank = university.get('rank', '')
+    overall_score = university.get('overall_score', '')
+    logo = university.get('logo', '')
+    
+    # 只有中文名存在的才加入展示数据
+    if not title_zh:
+        return None
+    
+    return {
+        "name": title_zh,
+        "value": overall_score,
+        "rank": rank,
+        "date": year,
+        "logo": logo
+    }
+
+
+def sort_display_data(all_display_data):
+    """
+    按年份、排名排序展示数据，排名只解析一次
+
+    Returns:
+        list: 排序后的展示数据
+    """
+    return RankTable(all_display_data).sorted_items()
+
+
+def load_display_data_by_year(display_file):
+    """
+    读取已有的展示数据并按年份分组
+    
+    Returns:
+        dict: {年份: 展示数据列表}，文件不存在或读取失败时返回空字典
+    """
+    if not display_file.exists():
+        return {}
+    try:
+        data = load_records(display_file)
+    except Exception as e:
+        print(f"读取已有展示数据 {display_file} 时出错: {e}")
+        return {}
+    
+    data_by_year = {}
+    for item in data:
+        data_by_year.setdefault(item['date'], []).append(item)
+    return data_by_year
+
+
+def extract_year_display_data(task):
+    """
+    提取单个年份的展示数据，可以在子进程中执行
+    
+    Args:
+        task (tuple): (年份, 带中文名的数据文件)
+        
+    Returns:
+        tuple or None: (展示数据, {中文名: 英文名})，处理失败时返回None
+    """
+    year, file_path = task
+    print(f"处理 {year} 年数据...")
+    
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            universities = json.load(f)
+        
+        display_data = []
+        titles = {}
+        for university in universities:
+            display_item = to_display_item(university, year)
+            if display_item:
+                display_data.append(display_item)
+                titles[display_item['name']] = university.get('title', '')
+        return display_data, titles
+                
+    except Exception as e:
+        print(f"处理文件 {file_path} 时出错: {e}")
+        return None
+
+
+def generate_display_data(force=False, fmt=DEFAULT_FORMAT, jobs=DEFAULT_JOBS):
     """
     生成展示数据
+    只重新提取翻译文件有变化的年份，其他年份沿用已有的 rank.json 中的数据
+    
+    Args:
+        force (bool): 是否忽略构建清单，重新提取所有年份
+        fmt (str): 展示数据的格式，见 qs_io.FORMAT_SUFFIXES，如 columnar 输出 rank.columns.json.gz
+        jobs (int): 同时处理的年份数（进程数）
     """
     script_dir = Path(__file__).parent
     parsed_dir = script_dir / "data" / "parsed"
     display_dir = script_dir / "data" / "display"
+    display_file = with_format(display_dir / "rank.json", fmt)
     
     # 确保输出目录存在
     display_dir.mkdir(parents=True, exist_ok=True)
@@ -34,72 +149,145 @@ def generate_display_data():
     
     print(f"找到 {len(chinese_files)} 个翻译文件")
     
+    manifest = BuildManifest(force=force)
+    files_by_year = {file_path.stem.replace("_with_chinese", ""): file_path for file_path in sorted(chinese_files)}
+    
+    # 翻译文件已删除的年份需要从展示数据中去掉
+    removed_years = [year for year in manifest.keys('display') if year not in files_by_year]
+    for year in removed_years:
+        manifest.forget('display', year)
+    
+    fresh_years = {year for year, file_path in files_by_year.items()
+                   if manifest.is_up_to_date('display', year, [file_path], [display_file])}
+    if len(fresh_years) == len(files_by_year) and not removed_years:
+        manifest.save()
+        print("所有年份都没有变化，展示数据已是最新")
+        return
+    
+    existing_data = load_display_data_by_year(display_file) if fresh_years else {}
     all_display_data = []
+    # 本次处理的年份中 {中文名: 英文名}，用于生成搜索索引
+    titles = {}
     
-    for file_path in sorted(chinese_files):
-        # 从文件名提取年份
-        year = file_path.stem.replace("_with_chinese", "")
-        print(f"处理 {year} 年数据...")
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                universities = json.load(f)
-            
-            count = 0
-            for university in universities:
-                # 提取所需字段
-                title_zh = university.get('title_zh')
-                rank = university.get('rank', '')
-                overall_score = university.get('overall_score', '')
-                logo = university.get('logo', '')
-                
-                # 只有中文名存在的才加入展示数据
-                if title_zh and title_zh != "":
-                    display_item = {
-                        "name": title_zh,
-                        "value": overall_score,
-                        "rank": rank,
-                        "date": year,
-                        "logo": logo
-                    }
-                    all_display_data.append(display_item)
-                    count += 1
-            
-            print(f"  - 成功提取 {count} 所大学的展示数据")
-                    
-        except Exception as e:
-            print(f"处理文件 {file_path} 时出错: {e}")
+    # 需要重新提取的年份并行处理，结果按年份顺序合并
+    stale_years = [year for year in files_by_year if year not in fresh_years or year not in existing_data]
+    tasks = [(year, files_by_year[year]) for year in stale_years]
+    results = dict(zip(stale_years, map_years(extract_year_display_data, tasks, jobs)))
     
-    # 对数据进行排序：按年份，然后按排名
-    def get_sort_key(item):
-        """
-        生成排序键：先按年份，再按排名
-        """
-        year = item['date']
-        rank_str = item['rank']
-        
-        # 处理排名字段，提取数字
-        if rank_str and rank_str.isdigit():
-            rank_num = int(rank_str)
-        elif rank_str and '-' in rank_str:
-            # 处理范围排名如 "501-510"，取第一个数字
-            try:
-                rank_num = int(rank_str.split('-')[0])
-            except:
-                rank_num = 9999
-        else:
-            rank_num = 9999  # 无排名的放到最后
+    for year, file_path in files_by_year.items():
+        if year not in results:
+            print(f"{year} 年数据没有变化，沿用已有展示数据")
+            all_display_data.extend(existing_data[year])
+            continue
+        
+        if results[year] is None:
+            # 处理失败的年份不记录，下次重新处理
+            files_by_year[year] = None
+            continue
         
-        return (year, rank_num)
+        display_data, year_titles = results[year]
+        all_display_data.extend(display_data)
+        titles.update(year_titles)
+        print(f"{year} 年: 成功提取 {len(display_data)} 所大学的展示数据")
     
-    # 排序数据
-    all_display_data.sort(key=get_sort_key)
+    # 对数据进行排序：按年份，然后按排名
+    all_display_data = sort_display_data(all_display_data)
     
     # 保存展示数据
-    output_file = display_dir / "rank.json"
+    if save_display_data(all_display_data, display_file, titles):
+        # rank.json 重新写入后所有年份都要记录新的输出指纹
+        for year, file_path in files_by_year.items():
+            if file_path is None:
+                manifest.forget('display', year)
+            else:
+                manifest.record('display', year, [file_path], [display_file])
+        manifest.save()
+
+
+def write_if_changed(file_path, content):
+    """
+    内容有变化时才写入文件，没有变化的分片保持原来的修改时间，浏览器和CDN的缓存继续有效
+    
+    Returns:
+        bool: 是否写入了文件
+    """
+    if file_path.exists() and file_path.read_bytes() == content:
+        return False
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, file_path)
+    return True
+
+
+def save_display_shards(all_display_data, display_dir):
+    """
+    按年份拆分展示数据，写入 years/{年份}.json 以及预压缩的 .gz/.br 文件，并生成 index.json 索引
+    服务器开启 gzip_static/brotli_static 后，浏览器请求 .json 时会直接返回预压缩的文件
+    
+    Args:
+        all_display_data (list): 已排序的展示数据
+        display_dir (Path): 展示数据目录
+    """
+    years_dir = display_dir / "years"
+    years_dir.mkdir(parents=True, exist_ok=True)
+    
+    data_by_year = {}
+    for item in all_display_data:
+        data_by_year.setdefault(item['date'], []).append(item)
+    
+    years = []
+    for year, items in sorted(data_by_year.items()):
+        content = json.dumps(items, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        shard_file = years_dir / f"{year}.json"
+        changed = write_if_changed(shard_file, content)
+        # 压缩比较耗时，分片没有变化且压缩文件已存在时跳过；mtime=0 让相同内容的压缩结果完全一致
+        gz_file = years_dir / f"{year}.json.gz"
+        if changed or not gz_file.exists():
+            write_if_changed(gz_file, gzip.compress(content, compresslevel=9, mtime=0))
+        br_file = years_dir / f"{year}.json.br"
+        if brotli is not None and (changed or not br_file.exists()):
+            write_if_changed(br_file, brotli.compress(content))
+        years.append({
+            "year": year,
+            "count": len(items),
+            "file": f"years/{year}.json",
+            "size": len(content),
+            # 页面请求分片时带上版本号，内容变化后不会读到缓存的旧数据
+            "version": hashlib.sha256(content).hexdigest()[:12]
+        })
+    
+    # 删除已经没有数据的年份的分片
+    for shard_file in years_dir.iterdir():
+        if shard_file.name.split('.')[0] not in data_by_year:
+            shard_file.unlink()
+    
+    index = {
+        "latest": years[-1]["year"] if years else None,
+        "years": years
+    }
+    write_if_changed(display_dir / "index.json", json.dumps(index, ensure_ascii=False, indent=2).encode('utf-8'))
+    print(f"按年份生成 {len(years)} 个分片: {years_dir}")
+
+
+def save_display_data(all_display_data, output_file, titles=None):
+    """
+    保存展示数据、按年份拆分的分片和搜索索引并打印各年份统计，同时删除其他格式的旧展示数据
+    
+    Args:
+        all_display_data (list): 已排序的展示数据
+        output_file (Path): 输出文件路径，根据扩展名决定格式
+        titles (dict): 本次处理的大学的 {中文名: 英文名}，用于搜索索引
+        
+    Returns:
+        bool: 是否保存成功
+    """
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(all_display_data, f, ensure_ascii=False, indent=2)
+        with open_writer(output_file, detect_format(output_file) or DEFAULT_FORMAT) as writer:
+            for item in all_display_data:
+                writer.write(item)
+        remove_other_formats(output_file)
+        save_display_shards(all_display_data, Path(output_file).parent)
+        save_search_index(all_display_data, titles or {}, Path(output_file).parent)
         
         print(f"\n✅ 展示数据生成成功！")
         print(f"输出文件: {output_file}")
@@ -114,9 +302,11 @@ def generate_display_data():
         print("\n各年份数据统计:")
         for year in sorted(year_counts.keys()):
             print(f"  {year}年: {year_counts[year]} 所大学")
+        return True
             
     except Exception as e:
         print(f"保存展示数据时出错: {e}")
+        return False
 
 
 def preview_display_data(limit=5):
@@ -127,29 +317,20 @@ def preview_display_data(limit=5):
         limit (int): 预览条数
     """
     script_dir = Path(__file__).parent
-    display_file = script_dir / "data" / "display" / "rank.json"
+    display_file = find_data_file(script_dir / "data" / "display" / "rank.json")
     
-    if not display_file.exists():
+    if display_file is None:
         print("展示数据文件不存在，请先运行生成功能")
         return
     
     try:
-        with open(display_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # 优先显示有具体分数的记录（最新年份）
-        latest_year = max(item['date'] for item in data)
-        scored_data = [item for item in data 
-                      if item['date'] == latest_year and item['value'] != 'n/a' and item['value'] != '']
+        data = load_records(display_file)
+        table = RankTable(data)
         
-        # 按排名排序
-        def get_rank_num(item):
-            rank_str = item['rank']
-            if rank_str and rank_str.isdigit():
-                return int(rank_str)
-            return 9999
-        
-        scored_data_sorted = sorted(scored_data, key=get_rank_num)
+        # 优先显示有具体分数的记录（最新年份），按排名排序
+        latest_year = table.latest_year()
+        scored_indices = table.scored_indices(table.year_indices(latest_year))
+        scored_data_sorted = [data[i] for i in table.sort_order(scored_indices, by_year=False)]
         
         print(f"展示数据预览（{latest_year}年有具体分数的前{limit}条）:")
         print("="*60)
@@ -162,7 +343,7 @@ def preview_display_data(limit=5):
             print()
         
         print(f"总计: {len(data)} 条记录")
-        print(f"其中有具体分数的: {len([item for item in data if item['value'] != 'n/a' and item['value'] != ''])} 条")
+        print(f"其中有具体分数的: {len(table.scored_indices())} 条")
         print(f"分数为n/a的: {len([item for item in data if item['value'] == 'n/a'])} 条")
         
     except Exception as e:
@@ -174,52 +355,39 @@ def analyze_display_data():
     分析展示数据
     """
     script_dir = Path(__file__).parent
-    display_file = script_dir / "data" / "display" / "rank.json"
+    display_file = find_data_file(script_dir / "data" / "display" / "rank.json")
     
-    if not display_file.exists():
+    if display_file is None:
         print("展示数据文件不存在，请先运行生成功能")
         return
     
     try:
-        with open(display_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_records(display_file)
+        table = RankTable(data)
         
         print("展示数据分析报告")
         print("="*50)
         
         # 按年份统计
-        year_stats = {}
-        for item in data:
-            year = item['date']
-            if year not in year_stats:
-                year_stats[year] = 0
-            year_stats[year] += 1
+        year_stats = table.count_by_year()
         
         print("各年份数据统计:")
-        for year in sorted(year_stats.keys()):
-            print(f"  {year}年: {year_stats[year]} 所大学")
+        for year, count in year_stats.items():
+            print(f"  {year}年: {count} 所大学")
         
         # 统计有分数的数据
-        scored_data = [item for item in data if item['value'] and item['value'] != '']
-        print(f"\n有分数的记录: {len(scored_data)} / {len(data)} ({len(scored_data)/len(data)*100:.1f}%)")
+        scored_count = len(table.scored_indices())
+        print(f"\n有分数的记录: {scored_count} / {len(data)} ({scored_count/len(data)*100:.1f}%)")
         
         # 统计有Logo的数据
         logo_data = [item for item in data if item['logo'] and item['logo'] != '']
         print(f"有Logo的记录: {len(logo_data)} / {len(data)} ({len(logo_data)/len(data)*100:.1f}%)")
         
         # 找出排名最高的几所大学（最近年份）
-        latest_year = max(year_stats.keys())
-        latest_data = [item for item in data if item['date'] == latest_year]
+        latest_year = table.latest_year()
         
         print(f"\n{latest_year}年排名前10的大学:")
-        # 按排名排序（处理可能的字符串格式）
-        def get_rank_num(item):
-            rank_str = item['rank']
-            if rank_str and rank_str.isdigit():
-                return int(rank_str)
-            return 9999  # 无排名的放到最后
-        
-        latest_data_sorted = sorted(latest_data, key=get_rank_num)
+        latest_data_sorted = [data[i] for i in table.sort_order(table.year_indices(latest_year), by_year=False)]
         
         for i, item in enumerate(latest_data_sorted[:10]):
             print(f"  {item['rank']:>3}. {item['name']}")
@@ -237,9 +405,20 @@ if __name__ == "__main__":
             preview_display_data(limit)
         elif sys.argv[1] == "--analyze":
             analyze_display_data()
+        elif sys.argv[1] in ("--force", "--format", "--jobs"):
+            try:
+                fmt = get_format_option(sys.argv)
+                jobs = get_jobs_option(sys.argv)
+            except ValueError as e:
+                print(f"错误：{e}")
+                sys.exit(1)
+            generate_display_data(force='--force' in sys.argv, fmt=fmt, jobs=jobs)
         else:
             print("使用方法:")
-            print("  python generate_display_data.py          # 生成展示数据")
+            print("  python generate_display_data.py          # 生成展示数据（只处理有变化的年份）")
+            print("  python generate_display_data.py --force  # 重新生成所有年份的展示数据")
+            print("  python generate_display_data.py --format columnar  # 指定格式：json/ndjson/ndjson.gz/columnar")
+            print("  python generate_display_data.py --jobs 4  # 同时处理4个年份")
             print("  python generate_display_data.py --preview [数量]  # 预览数据")
             print("  python generate_display_data.py --analyze # 分析数据")
     else:
@@ -10,43 +10,118 @@ QS世界大学排名数据处理脚本
 import json
 import os
 import re
+import sys
 from collections import defaultdict
 from pathlib import Path
 
+from build_manifest import BuildManifest
+from qs_io import DEFAULT_FORMAT, get_format_option, iter_json_items, open_writer, remove_other_formats, with_format
 
-def extract_score_nodes(file_path):
+
+def iter_score_nodes(file_path):
     """
-    根据传入的文件路径，解析文件内容，提取score_nodes属性的值
+    根据传入的文件路径，逐条产出score_nodes属性中的记录
+    安装了ijson时流式解析，单个切片文件再大内存占用也不会增加
     
     Args:
         file_path (str): JSON文件的路径
         
-    Returns:
-        list: score_nodes的数据列表，如果文件不存在或解析失败则返回空列表
+    Yields:
+        dict: score_nodes中的一条记录
+        
+    Raises:
+        文件不存在或解析失败时打印错误后重新抛出，调用方据此知道数据不完整
+        （流式解析时，出错前可能已经产出了部分记录）
     """
+    count = 0
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        for node in iter_json_items(file_path, 'score_nodes'):
+            count += 1
+            yield node
         
-        # 提取score_nodes属性
-        score_nodes = data.get('score_nodes', [])
-        print(f"从文件 {file_path} 提取到 {len(score_nodes)} 条记录")
-        return score_nodes
+        print(f"从文件 {file_path} 提取到 {count} 条记录")
         
     except FileNotFoundError:
         print(f"错误：文件 {file_path} 不存在")
-        return []
+        raise
     except json.JSONDecodeError as e:
         print(f"错误：解析JSON文件 {file_path} 失败: {e}")
-        return []
+        raise
     except Exception as e:
-        print(f"错误：处理文件 {file_path} 时发生异常: {e}")
+        print(f"错误：处理文件 {file_path} 时发生异常（已提取 {count} 条记录）: {e}")
+        raise
+
+
+def extract_score_nodes(file_path):
+    """
+    根据传入的文件路径，解析文件内容，提取score_nodes属性的值
+    
+    Args:
+        file_path (str): JSON文件的路径
+        
+    Returns:
+        list: score_nodes的数据列表，如果文件不存在或解析失败则返回空列表
+    """
+    try:
+        return list(iter_score_nodes(file_path))
+    except Exception:
         return []
 
 
-def merge_data_by_year():
+def get_slice_order(file_path):
+    """
+    从切片文件名中提取 (年份, 序号)，如 2022-1000.json -> ('2022', 1000)
+    
+    Returns:
+        tuple or None: 文件名不以年份开头时返回None
+    """
+    filename = Path(file_path).stem  # 获取不带扩展名的文件名
+    year_match = re.match(r'^(\d{4})(?:-(\d+))?', filename)
+    if not year_match:
+        return None
+    return year_match.group(1), int(year_match.group(2) or 0)
+
+
+def group_slice_files(slice_dir):
+    """
+    把切片文件按年份分组，同一年份内按文件名中的序号排序
+    
+    Args:
+        slice_dir (Path): 切片文件目录
+        
+    Returns:
+        dict: {年份: [文件路径, ...]}，按年份排序
+    """
+    grouped = defaultdict(list)
+    for file_path in slice_dir.glob("*.json"):
+        order = get_slice_order(file_path)
+        if not order:
+            print(f"警告：无法从文件名 {file_path.stem} 中提取年份，跳过该文件")
+            continue
+        grouped[order[0]].append((order[1], file_path))
+    
+    return {year: [file_path for _, file_path in sorted(files)] for year, files in sorted(grouped.items())}
+
+
+def iter_slice_records(slice_files):
+    """
+    依次产出多个切片文件中的score_nodes记录
+    
+    Args:
+        slice_files (list): 同一年份的切片文件路径
+    """
+    for file_path in slice_files:
+        yield from iter_score_nodes(file_path)
+
+
+def merge_data_by_year(force=False, fmt=DEFAULT_FORMAT):
     """
     遍历data/raw/slice下的文件，按年份合并数据并写入data/raw/merge目录
+    切片文件没有变化的年份直接跳过
+    
+    Args:
+        force (bool): 是否忽略构建清单，重新合并所有年份
+        fmt (str): 合并文件的格式，见 qs_io.FORMAT_SUFFIXES
     """
     # 设置路径
     slice_dir = Path("data/raw/slice")
@@ -60,41 +135,41 @@ def merge_data_by_year():
         print(f"错误：目录 {slice_dir} 不存在")
         return
     
-    # 用于存储按年份分类的数据
-    yearly_data = defaultdict(list)
+    manifest = BuildManifest(force=force)
     
-    # 遍历slice目录下的所有JSON文件
-    for file_path in slice_dir.glob("*.json"):
-        print(f"正在处理文件: {file_path}")
-        
-        # 从文件名中提取年份
-        filename = file_path.stem  # 获取不带扩展名的文件名
-        year_match = re.match(r'^(\d{4})', filename)
-        
-        if not year_match:
-            print(f"警告：无法从文件名 {filename} 中提取年份，跳过该文件")
+    # 遍历slice目录下的所有JSON文件，同一年份的切片按序号顺序合并
+    for year, slice_files in group_slice_files(slice_dir).items():
+        output_file = with_format(merge_dir / f"{year}.json", fmt)
+        if manifest.is_up_to_date('merge', year, slice_files, [output_file]):
+            print(f"{year} 年的切片文件没有变化，跳过")
             continue
-            
-        year = year_match.group(1)
-        
-        # 提取score_nodes数据
-        score_nodes = extract_score_nodes(file_path)
-        
-        if score_nodes:
-            yearly_data[year].extend(score_nodes)
-    
-    # 将合并后的数据写入merge目录
-    for year, combined_data in yearly_data.items():
-        output_file = merge_dir / f"{year}.json"
         
+        # 逐条读取切片记录并直接写入合并文件，内存中不保留整年的数据
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(combined_data, f, ensure_ascii=False, indent=2)
-            
-            print(f"成功将 {year} 年的数据（共 {len(combined_data)} 条记录）写入 {output_file}")
+            with open_writer(output_file, fmt) as writer:
+                for file_path in slice_files:
+                    print(f"正在处理文件: {file_path}")
+                    for record in iter_score_nodes(file_path):
+                        writer.write(record)
+                if not writer.count:
+                    # 没有任何记录时不替换已有的合并文件
+                    writer.discard()
             
         except Exception as e:
-            print(f"错误：写入文件 {output_file} 时发生异常: {e}")
+            # 写入器出错时不替换已有的合并文件，也不记录到构建清单，下次运行时重新合并
+            print(f"错误：合并 {year} 年的数据时发生异常，跳过该年份: {e}")
+            continue
+        
+        if not writer.count:
+            # 没有任何记录的年份不生成合并文件，已有的合并文件保留，也不记录到构建清单
+            print(f"警告：{year} 年的切片文件中没有任何记录，保留已有的合并文件")
+            continue
+        
+        remove_other_formats(output_file)
+        manifest.record('merge', year, slice_files, [output_file])
+        print(f"成功将 {year} 年的数据（共 {writer.count} 条记录）写入 {output_file}")
+    
+    manifest.save()
 
 
 def main():
@@ -108,8 +183,14 @@ def main():
     script_dir = Path(__file__).parent
     os.chdir(script_dir)
     
-    # 执行数据合并
-    merge_data_by_year()
+    try:
+        fmt = get_format_option(sys.argv)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return
+    
+    # 执行数据合并，--force 忽略构建清单重新合并所有年份，--format 指定合并文件的格式
+    merge_data_by_year(force='--force' in sys.argv, fmt=fmt)
     
     print("=" * 50)
     print("数据处理完成！")
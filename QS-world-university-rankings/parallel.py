@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按年份并行处理的工具
+功能：用进程池同时处理多个年份的文件，结果按输入顺序返回，与逐个处理时的输出完全一致
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+# 默认只用一个进程，与逐个处理相同
+DEFAULT_JOBS = 1
+
+
+def get_jobs_option(argv):
+    """
+    从命令行参数中取出 --jobs 的值
+
+    Args:
+        argv (list): 命令行参数
+
+    Returns:
+        int: 进程数，--jobs 0 表示使用全部CPU核数，没有指定时返回默认值
+    """
+    if '--jobs' not in argv:
+        return DEFAULT_JOBS
+    index = argv.index('--jobs')
+    try:
+        jobs = int(argv[index + 1])
+    except (IndexError, ValueError):
+        raise ValueError("--jobs 需要一个整数参数")
+    return jobs if jobs > 0 else os.cpu_count() or 1
+
+
+def strip_jobs_option(argv):
+    """去掉命令行参数中的 --jobs N"""
+    if '--jobs' not in argv:
+        return list(argv)
+    index = argv.index('--jobs')
+    return argv[:index] + argv[index + 2:]
+
+
+def iter_years(func, items, jobs=DEFAULT_JOBS, initializer=None, initargs=()):
+    """
+    对每个年份的任务调用func，按items的顺序逐个产出结果，
+    每个结果在它和它之前的任务都完成后立即产出，调用方可以边处理边保存
+
+    参数同 map_years
+
+    Yields:
+        各任务的结果
+    """
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            yield func(item)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items)), initializer=initializer,
+                             initargs=initargs) as executor:
+        yield from executor.map(func, items)
+
+
+def map_years(func, items, jobs=DEFAULT_JOBS, initializer=None, initargs=()):
+    """
+    对每个年份的任务调用func，结果按items的顺序返回
+
+    Args:
+        func: 处理单个任务的函数，必须是模块级函数（子进程中需要能导入）
+        items (iterable): 任务列表
+        jobs (int): 进程数，为1或只有一个任务时直接在当前进程中执行
+        initializer: 每个进程开始处理前调用一次，用于创建翻译器等较重的对象
+        initargs (tuple): initializer的参数
+
+    Returns:
+        list: 各任务的结果
+    """
+    return list(iter_years(func, items, jobs, initializer, initargs))
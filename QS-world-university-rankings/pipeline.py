@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QS数据处理流水线
+功能：一次遍历完成 合并切片 -> 提取国内大学 -> 翻译校名 -> 生成展示数据，
+每条记录以生成器的方式依次流过各个阶段，默认只写出最终的 data/display/rank.json，
+需要时可以同时写出各阶段的中间文件（与单独运行各脚本的输出相同）
+"""
+
+import argparse
+from contextlib import ExitStack
+from pathlib import Path
+
+from build_manifest import BuildManifest
+from extract_domestic_data import DOMESTIC_COUNTRIES, is_domestic_university
+from generate_display_data import load_display_data_by_year, save_display_data, sort_display_data, to_display_item
+from merge_data import group_slice_files, iter_slice_records
+from qs_io import DEFAULT_FORMAT, FORMAT_SUFFIXES, JsonArrayWriter, open_writer, with_format, write_through
+from translate_university_names import UniversityNameTranslator, get_baidu_credentials
+
+
+def translate_records(universities, translator, **kwargs):
+    """逐条翻译校名"""
+    for university in universities:
+        translator.translate_record(university, **kwargs)
+        yield university
+
+
+def get_intermediate_files(year, data_dir, fmt=DEFAULT_FORMAT):
+    """各阶段中间文件的路径：合并（指定格式）、国内大学、中文翻译"""
+    return [
+        with_format(data_dir / "raw" / "merge" / f"{year}.json", fmt),
+        data_dir / "parsed" / f"{year}.json",
+        data_dir / "parsed" / f"{year}_with_chinese.json"
+    ]
+
+
+def process_year(year, slice_files, translator, data_dir, keep_intermediate=False, fmt=DEFAULT_FORMAT, **kwargs):
+    """
+    处理单个年份的数据
+
+    Args:
+        year (str): 年份
+        slice_files (list): 该年份的切片文件
+        translator (UniversityNameTranslator): 翻译器
+        data_dir (Path): data目录
+        keep_intermediate (bool): 是否写出中间文件
+        fmt (str): 合并文件的格式
+        **kwargs: 传给翻译器的参数
+
+    Returns:
+        tuple: (该年份的展示数据, {中文名: 英文名}, 在线翻译请求失败的名称数)
+    """
+    translator.failed_names.clear()
+    with ExitStack() as stack:
+        if keep_intermediate:
+            merge_file, parsed_file, chinese_file = get_intermediate_files(year, data_dir, fmt)
+            merge_writer = stack.enter_context(open_writer(merge_file, fmt))
+            parsed_writer = stack.enter_context(JsonArrayWriter(parsed_file))
+            chinese_writer = stack.enter_context(JsonArrayWriter(chinese_file))
+        else:
+            merge_writer = parsed_writer = chinese_writer = None
+
+        records = write_through(iter_slice_records(slice_files), merge_writer)
+        domestic = write_through(filter(is_domestic_university, records), parsed_writer)
+        translated = write_through(translate_records(domestic, translator, **kwargs), chinese_writer)
+
+        display_data = []
+        titles = {}
+        for university in translated:
+            item = to_display_item(university, year)
+            if item:
+                display_data.append(item)
+                titles[item['name']] = university.get('title', '')
+
+    translator.translation_cache.save()
+    return display_data, titles, len(translator.failed_names)
+
+
+def run_pipeline(keep_intermediate=False, force=False, fmt=DEFAULT_FORMAT, **kwargs):
+    """
+    运行完整流水线
+    切片文件、国内大学范围和翻译映射表都没有变化的年份沿用已有的 rank.json 中的数据
+
+    Args:
+        keep_intermediate (bool): 是否写出中间文件
+        force (bool): 是否忽略构建清单，重新处理所有年份
+        fmt (str): 展示数据和合并文件的格式，见 qs_io.FORMAT_SUFFIXES
+        **kwargs: 传给翻译器的参数（如fallback、百度翻译的API密钥）
+    """
+    script_dir = Path(__file__).parent
+    data_dir = script_dir / "data"
+    slice_dir = data_dir / "raw" / "slice"
+    display_dir = data_dir / "display"
+    display_file = with_format(display_dir / "rank.json", fmt)
+
+    if not slice_dir.exists():
+        print(f"错误：目录 {slice_dir} 不存在")
+        return
+
+    slice_files_by_year = group_slice_files(slice_dir)
+    if not slice_files_by_year:
+        print("未找到切片文件")
+        return
+
+    translator = UniversityNameTranslator()
+    manifest = BuildManifest(force=force)
+    params = {
+        'countries': sorted(DOMESTIC_COUNTRIES),
+        'mapping': translator.university_mapping,
+        'fallback': kwargs.get('fallback', 'youdao')
+    }
+
+    def get_outputs(year):
+        return [display_file] + (get_intermediate_files(year, data_dir, fmt) if keep_intermediate else [])
+
+    removed_years = [year for year in manifest.keys('pipeline') if year not in slice_files_by_year]
+    for year in removed_years:
+        manifest.forget('pipeline', year)
+
+    fresh_years = {year for year, slice_files in slice_files_by_year.items()
+                   if manifest.is_up_to_date('pipeline', year, slice_files, get_outputs(year), params)}
+    if len(fresh_years) == len(slice_files_by_year) and not removed_years:
+        manifest.save()
+        print("所有年份都没有变化，展示数据已是最新")
+        return
+    existing_data = load_display_data_by_year(display_file) if fresh_years else {}
+    stale_years = [year for year in slice_files_by_year if year not in fresh_years or year not in existing_data]
+
+    if kwargs.get('fallback') == 'baidu':
+        # 百度翻译需要先批量翻译所有未知名称，这里先扫描一遍需要处理的年份中国内大学的名称
+        try:
+            english_names = [
+                university.get('title', '')
+                for year in stale_years
+                for university in iter_slice_records(slice_files_by_year[year])
+                if is_domestic_university(university)
+            ]
+        except Exception as e:
+            print(f"错误：读取切片文件时发生异常，本次不更新展示数据: {e}")
+            return
+        translator.prefetch_translations(english_names, method='baidu', **kwargs)
+
+    all_display_data = []
+    titles = {}
+    unfinished_years = set()
+    for year, slice_files in slice_files_by_year.items():
+        if year not in stale_years:
+            print(f"{year} 年数据没有变化，沿用已有展示数据")
+            all_display_data.extend(existing_data[year])
+            continue
+        print(f"处理 {year} 年数据（{len(slice_files)} 个切片文件）...")
+        try:
+            display_data, year_titles, failed_count = process_year(year, slice_files, translator, data_dir,
+                                                                   keep_intermediate, fmt, **kwargs)
+        except Exception as e:
+            # 切片文件损坏时该年份的数据不完整，不写出展示数据，也不记录到构建清单
+            print(f"错误：处理 {year} 年数据时发生异常，本次不更新展示数据: {e}")
+            return
+        titles.update(year_titles)
+        print(f"  - 成功提取 {len(display_data)} 所大学的展示数据")
+        if failed_count:
+            # 不记录到构建清单，下次运行时重新处理该年份
+            print(f"  - 有 {failed_count} 个名称在线翻译请求失败，下次运行时重新处理 {year} 年数据")
+            unfinished_years.add(year)
+        all_display_data.extend(display_data)
+
+    all_display_data = sort_display_data(all_display_data)
+    display_dir.mkdir(parents=True, exist_ok=True)
+    if save_display_data(all_display_data, display_file, titles):
+        # rank.json 重新写入后所有年份都要记录新的输出指纹（翻译不完整的年份除外）
+        for year, slice_files in slice_files_by_year.items():
+            if year in unfinished_years:
+                continue
+            manifest.record('pipeline', year, slice_files, get_outputs(year), params)
+        manifest.save()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='QS数据处理流水线：合并 -> 提取国内大学 -> 翻译 -> 生成展示数据')
+    parser.add_argument('--keep-intermediate', action='store_true',
+                        help='同时写出合并、国内大学、中文翻译的中间文件')
+    parser.add_argument('--baidu', action='store_true',
+                        help='预定义映射中没有的校名使用百度翻译批量翻译（默认使用有道翻译）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略构建清单，重新处理所有年份')
+    parser.add_argument('--format', choices=list(FORMAT_SUFFIXES), default=DEFAULT_FORMAT,
+                        help='展示数据和合并文件的格式（默认json）')
+    args = parser.parse_args()
+
+    kwargs = {'fallback': 'baidu', **get_baidu_credentials()} if args.baidu else {}
+    run_pipeline(keep_intermediate=args.keep_intermediate, force=args.force, fmt=args.format, **kwargs)
+
+
+if __name__ == "__main__":
+    main()
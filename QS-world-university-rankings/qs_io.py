@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QS数据文件的流式读写工具
+支持以下几种格式，读取时根据扩展名自动识别：
+- json：缩进2格的JSON数组（默认），便于查看和比较差异
+- ndjson：每行一条紧凑的JSON记录，可以逐行读取
+- ndjson.gz：gzip压缩的NDJSON
+- columnar：gzip压缩的列式JSON，同一字段的值放在一起，压缩率最高，浏览器也可以直接解压读取
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+
+try:
+    # 可选依赖：安装后按事件流式解析JSON，内存占用与文件大小无关
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# 格式名 -> 文件扩展名
+FORMAT_SUFFIXES = {
+    'json': '.json',
+    'ndjson': '.ndjson',
+    'ndjson.gz': '.ndjson.gz',
+    'columnar': '.columns.json.gz'
+}
+DEFAULT_FORMAT = 'json'
+
+# 紧凑格式的分隔符，不输出多余的空格
+COMPACT_SEPARATORS = (',', ':')
+
+
+def detect_format(file_path):
+    """
+    根据扩展名判断文件格式
+
+    Returns:
+        str or None: 格式名，不是支持的格式时返回None
+    """
+    name = Path(file_path).name
+    # 先匹配较长的扩展名，.columns.json.gz 不能被当成 .json
+    for fmt, suffix in sorted(FORMAT_SUFFIXES.items(), key=lambda item: -len(item[1])):
+        if name.endswith(suffix):
+            return fmt
+    return None
+
+
+def strip_format_suffix(file_path):
+    """去掉数据文件的扩展名，如 data/raw/merge/2024.ndjson.gz -> 2024"""
+    name = Path(file_path).name
+    fmt = detect_format(name)
+    return name[:-len(FORMAT_SUFFIXES[fmt])] if fmt else Path(name).stem
+
+
+def with_format(file_path, fmt):
+    """
+    把数据文件路径换成指定格式的扩展名，如 (rank.json, 'columnar') -> rank.columns.json.gz
+    """
+    file_path = Path(file_path)
+    return file_path.with_name(strip_format_suffix(file_path) + FORMAT_SUFFIXES[fmt])
+
+
+def format_variants(file_path):
+    """同一份数据所有格式的文件路径"""
+    return [with_format(file_path, fmt) for fmt in FORMAT_SUFFIXES]
+
+
+def find_data_file(file_path):
+    """
+    查找同一份数据已存在的文件，不限格式；存在多种格式时返回最新的一个
+
+    Args:
+        file_path (str): 任意格式的文件路径，如 data/display/rank.json
+
+    Returns:
+        Path or None: 已存在的文件路径，都不存在时返回None
+    """
+    existing = [path for path in format_variants(file_path) if path.exists()]
+    return max(existing, key=lambda path: path.stat().st_mtime) if existing else None
+
+
+def list_data_files(directory):
+    """
+    列出目录下的所有数据文件，同一份数据存在多种格式时取最新的一个
+
+    Args:
+        directory (Path): 数据目录
+
+    Returns:
+        list: 按文件名（不含扩展名）排序的文件路径
+    """
+    latest = {}
+    for file_path in Path(directory).iterdir():
+        if not file_path.is_file() or detect_format(file_path) is None:
+            continue
+        stem = strip_format_suffix(file_path)
+        if stem not in latest or file_path.stat().st_mtime > latest[stem].stat().st_mtime:
+            latest[stem] = file_path
+    return [latest[stem] for stem in sorted(latest)]
+
+
+def remove_other_formats(file_path):
+    """删除同一份数据其他格式的旧文件，避免读取方读到过期的数据"""
+    for path in format_variants(file_path):
+        if path != Path(file_path) and path.exists():
+            path.unlink()
+
+
+def iter_json_items(file_path, key=None):
+    """
+    逐条产出JSON文件中数组的元素
+    安装了ijson时边读边解析，不需要把整个文件读进内存；没有安装时退回 json.load 整体读取
+
+    Args:
+        file_path (str): JSON文件路径
+        key (str): 数组所在的顶层属性名，如 'score_nodes'；为None时文件本身就是数组
+    """
+    if ijson is not None:
+        with open(file_path, 'rb') as f:
+            # use_float=True 让小数解析为float而不是Decimal，与json.load的结果一致
+            yield from ijson.items(f, f'{key}.item' if key else 'item', use_float=True)
+        return
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    yield from (data.get(key, []) if key else data)
+
+
+class JsonArrayWriter:
+    """
+    逐条写入JSON数组，输出格式与 json.dump(records, f, ensure_ascii=False, indent=2) 完全一致，
+    但不需要先把所有记录放进内存。
+    先写入同目录下的临时文件，正常退出时才替换目标文件；写入过程中出错时删除临时文件，
+    不会留下看起来完整、实际被截断的数组
+
+    用法：
+        with JsonArrayWriter(output_file) as writer:
+            for record in records:
+                writer.write(record)
+    """
+
+    def __init__(self, output_file):
+        """
+        Args:
+            output_file (str): 输出文件路径，目录不存在时自动创建
+        """
+        self.output_file = output_file
+        self.count = 0
+        # 调用discard后关闭时不替换目标文件
+        self.discarded = False
+        self.file = None
+
+    def __enter__(self):
+        output_dir = os.path.dirname(str(self.output_file))
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self.tmp_file = f"{self.output_file}.tmp"
+        self.file = open(self.tmp_file, 'w', encoding='utf-8')
+        self.file.write('[')
+        return self
+
+    def write(self, record):
+        """写入一条记录"""
+        text = json.dumps(record, ensure_ascii=False, indent=2)
+        self.file.write(',\n  ' if self.count else '\n  ')
+        self.file.write(text.replace('\n', '\n  '))
+        self.count += 1
+
+    def discard(self):
+        """放弃这次写入，关闭时删除临时文件，已有的目标文件保持不变"""
+        self.discarded = True
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None or self.discarded:
+            self.file.close()
+            os.remove(self.tmp_file)
+            return
+        self.file.write('\n]' if self.count else ']')
+        self.file.close()
+        os.replace(self.tmp_file, self.output_file)
+
+
+class NdjsonWriter:
+    """
+    逐条写入NDJSON，每行一条紧凑的JSON记录，compress为True时使用gzip压缩
+
+    与 JsonArrayWriter 一样先写临时文件，出错时不替换目标文件，用法也相同
+    """
+
+    def __init__(self, output_file, compress=False):
+        """
+        Args:
+            output_file (str): 输出文件路径，目录不存在时自动创建
+            compress (bool): 是否gzip压缩
+        """
+        self.output_file = output_file
+        self.compress = compress
+        self.count = 0
+        self.discarded = False
+        self.file = None
+
+    def __enter__(self):
+        output_dir = os.path.dirname(str(self.output_file))
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self.tmp_file = f"{self.output_file}.tmp"
+        if self.compress:
+            self.file = gzip.open(self.tmp_file, 'wt', encoding='utf-8')
+        else:
+            self.file = open(self.tmp_file, 'w', encoding='utf-8')
+        return self
+
+    def write(self, record):
+        """写入一条记录"""
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=COMPACT_SEPARATORS))
+        self.file.write('\n')
+        self.count += 1
+
+    def discard(self):
+        """放弃这次写入，关闭时删除临时文件，已有的目标文件保持不变"""
+        self.discarded = True
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+        if exc_type is not None or self.discarded:
+            os.remove(self.tmp_file)
+            return
+        os.replace(self.tmp_file, self.output_file)
+
+
+class ColumnarWriter:
+    """
+    按列写入gzip压缩的JSON，文件内容为：
+        {"count": 记录数, "columns": {字段名: [各条记录的值, ...]}, "missing": {字段名: [缺少该字段的记录序号, ...]}}
+    同一字段的值放在一起，重复度高，压缩后比逐条记录的格式小得多。
+    列式数据需要写完所有记录才能输出，关闭时才写入文件；与 JsonArrayWriter 一样先写临时文件再替换，
+    出错时不会损坏已有的文件。
+
+    用法与 JsonArrayWriter 相同
+    """
+
+    def __init__(self, output_file):
+        """
+        Args:
+            output_file (str): 输出文件路径，目录不存在时自动创建
+        """
+        self.output_file = output_file
+        self.count = 0
+        self.discarded = False
+        self.columns = {}
+        self.missing = {}
+
+    def __enter__(self):
+        output_dir = os.path.dirname(str(self.output_file))
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        return self
+
+    def write(self, record):
+        """写入一条记录"""
+        for key in record:
+            if key not in self.columns:
+                # 新出现的字段，之前的记录都缺少这个字段
+                self.columns[key] = [None] * self.count
+                if self.count:
+                    self.missing[key] = list(range(self.count))
+        for key, values in self.columns.items():
+            if key in record:
+                values.append(record[key])
+            else:
+                values.append(None)
+                self.missing.setdefault(key, []).append(self.count)
+        self.count += 1
+
+    def discard(self):
+        """放弃这次写入，关闭时删除临时文件，已有的目标文件保持不变"""
+        self.discarded = True
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None or self.discarded:
+            return
+        table = {'count': self.count, 'columns': self.columns}
+        if self.missing:
+            table['missing'] = self.missing
+        tmp_file = f"{self.output_file}.tmp"
+        try:
+            with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+                json.dump(table, f, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        os.replace(tmp_file, self.output_file)
+
+
+def open_writer(output_file, fmt=DEFAULT_FORMAT):
+    """
+    创建指定格式的写入器
+
+    Args:
+        output_file (str): 输出文件路径
+        fmt (str): 格式名，见 FORMAT_SUFFIXES
+    """
+    if fmt == 'json':
+        return JsonArrayWriter(output_file)
+    if fmt in ('ndjson', 'ndjson.gz'):
+        return NdjsonWriter(output_file, compress=fmt == 'ndjson.gz')
+    if fmt == 'columnar':
+        return ColumnarWriter(output_file)
+    raise ValueError(f"不支持的格式: {fmt}，可选: {', '.join(FORMAT_SUFFIXES)}")
+
+
+def iter_columnar_rows(table):
+    """把列式数据还原成逐条记录"""
+    columns = table['columns']
+    missing = {key: set(indexes) for key, indexes in table.get('missing', {}).items()}
+    for index in range(table['count']):
+        yield {key: values[index] for key, values in columns.items()
+               if index not in missing.get(key, ())}
+
+
+def iter_records(file_path):
+    """
+    逐条读取数据文件中的记录，根据扩展名自动识别格式
+
+    Args:
+        file_path (str): 数据文件路径
+    """
+    fmt = detect_format(file_path)
+    if fmt in ('ndjson', 'ndjson.gz'):
+        opener = gzip.open if fmt == 'ndjson.gz' else open
+        with opener(file_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == 'columnar':
+        with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+            table = json.load(f)
+        yield from iter_columnar_rows(table)
+    else:
+        yield from iter_json_items(file_path)
+
+
+def load_records(file_path):
+    """读取数据文件中的所有记录，根据扩展名自动识别格式"""
+    return list(iter_records(file_path))
+
+
+def get_format_option(argv):
+    """
+    从命令行参数中取出 --format 的值
+
+    Args:
+        argv (list): 命令行参数
+
+    Returns:
+        str: 格式名，没有指定时返回默认格式
+    """
+    if '--format' not in argv:
+        return DEFAULT_FORMAT
+    index = argv.index('--format')
+    fmt = argv[index + 1] if index + 1 < len(argv) else None
+    if fmt not in FORMAT_SUFFIXES:
+        raise ValueError(f"不支持的格式: {fmt}，可选: {', '.join(FORMAT_SUFFIXES)}")
+    return fmt
+
+
+def write_through(records, writer):
+    """
+    把记录写入writer的同时原样产出，用于在流水线中保存中间结果
+
+    Args:
+        records (iterable): 记录
+        writer: 已打开的写入器（JsonArrayWriter等），为None时只产出不写入
+    """
+    for record in records:
+        if writer is not None:
+            writer.write(record)
+        yield record
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+展示数据的列式排名表
+功能：把展示数据中的年份、排名、分数统一解析一次，保存为按列存放的数组，
+排序、预览和统计分析都基于这些列，不再在各处重复解析排名字符串
+"""
+
+import math
+import re
+
+try:
+    # 可选依赖：安装后用numpy数组做排序和统计，数据量大时更快
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# 无排名的放到最后
+UNRANKED = 9999
+
+# 排名的几种写法：23、=23（并列）、501-510（区间）、1001+
+RANK_PATTERN = re.compile(r'^=?(\d+)(?:\s*-\s*(\d+)|(\+))?$')
+
+
+def parse_rank(rank_str):
+    """
+    解析排名字符串
+
+    Args:
+        rank_str (str): 排名，如 "23"、"=23"、"501-510"、"1001+"
+
+    Returns:
+        tuple: (最高名次, 最低名次)，如 "501-510" -> (501, 510)，"1001+" -> (1001, UNRANKED)，
+               无法解析的 -> (UNRANKED, UNRANKED)
+    """
+    match = RANK_PATTERN.match(str(rank_str or '').strip())
+    if not match:
+        return UNRANKED, UNRANKED
+    low = int(match.group(1))
+    if match.group(2):
+        return low, int(match.group(2))
+    if match.group(3):
+        return low, UNRANKED
+    return low, low
+
+
+def parse_score(value):
+    """
+    解析分数，"n/a"、空字符串等没有具体分数的返回nan
+    """
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return score
+
+
+class RankTable:
+    """
+    展示数据的列式表示
+
+    列：
+        years: 年份
+        rank_low / rank_high: 排名区间，单一名次时两者相同
+        scores: 分数，没有分数的为nan
+
+    安装numpy时各列为numpy数组，否则为list。行号与传入的展示数据一一对应。
+
+    用法：
+        table = RankTable(all_display_data)
+        all_display_data = table.sorted_items()
+    """
+
+    def __init__(self, items):
+        """
+        Args:
+            items (list): 展示数据
+        """
+        self.items = items
+        years = [item['date'] for item in items]
+        ranks = [parse_rank(item['rank']) for item in items]
+        rank_low = [low for low, _ in ranks]
+        rank_high = [high for _, high in ranks]
+        scores = [parse_score(item['value']) for item in items]
+
+        if np is not None:
+            self.years = np.array(years, dtype=str)
+            self.rank_low = np.array(rank_low, dtype=np.int64)
+            self.rank_high = np.array(rank_high, dtype=np.int64)
+            self.scores = np.array(scores, dtype=np.float64)
+        else:
+            self.years = years
+            self.rank_low = rank_low
+            self.rank_high = rank_high
+            self.scores = scores
+
+    def __len__(self):
+        return len(self.items)
+
+    def sort_order(self, indices=None, by_year=True):
+        """
+        排序后的行号：先按年份，再按排名；排名相同时保持原有顺序
+
+        Args:
+            indices (list): 参与排序的行号，默认全部
+            by_year (bool): 是否先按年份排序，为False时只按排名
+
+        Returns:
+            list: 行号
+        """
+        if indices is None:
+            indices = range(len(self))
+        if np is not None:
+            indices = np.asarray(indices, dtype=np.int64)
+            # lexsort以最后一个键为主键，排序是稳定的
+            keys = (self.rank_low[indices], self.years[indices]) if by_year else (self.rank_low[indices],)
+            return indices[np.lexsort(keys)].tolist()
+        if by_year:
+            return sorted(indices, key=lambda i: (self.years[i], self.rank_low[i]))
+        return sorted(indices, key=lambda i: self.rank_low[i])
+
+    def sorted_items(self):
+        """按年份、排名排序后的展示数据"""
+        return [self.items[i] for i in self.sort_order()]
+
+    def year_indices(self, year):
+        """某一年的所有行号"""
+        if np is not None:
+            return np.flatnonzero(self.years == year).tolist()
+        return [i for i, item_year in enumerate(self.years) if item_year == year]
+
+    def scored_indices(self, indices=None):
+        """有具体分数的行号"""
+        if indices is None:
+            indices = range(len(self))
+        if np is not None:
+            indices = np.asarray(indices, dtype=np.int64)
+            return indices[~np.isnan(self.scores[indices])].tolist()
+        return [i for i in indices if not math.isnan(self.scores[i])]
+
+    def latest_year(self):
+        """最近的年份，没有数据时返回None"""
+        return max(self.years) if len(self) else None
+
+    def count_by_year(self):
+        """
+        各年份的记录数
+
+        Returns:
+            dict: {年份: 记录数}，按年份排序
+        """
+        if np is not None:
+            years, counts = np.unique(self.years, return_counts=True)
+            return {str(year): int(count) for year, count in zip(years, counts)}
+        counts = {}
+        for year in self.years:
+            counts[year] = counts.get(year, 0) + 1
+        return dict(sorted(counts.items()))
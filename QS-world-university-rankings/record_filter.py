@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+声明式的大学记录过滤器
+功能：把 {"country": [...], "rank": [1, 500], ...} 这样的过滤条件编译成一个函数，
+多个命名过滤器可以在一次遍历中同时应用，分别输出各自的子集
+"""
+
+import json
+import math
+from pathlib import Path
+
+from rank_table import UNRANKED, parse_rank, parse_score
+
+
+# 自定义过滤器的配置文件，存在时与内置过滤器合并（同名的覆盖内置的）
+FILTERS_PATH = Path(__file__).parent / "data" / "filters.json"
+
+# 内置的过滤器（国内大学的过滤条件见 extract_domestic_data.DOMESTIC_FILTER）
+DEFAULT_FILTERS = {
+    "asia": {"region": ["Asia"]},
+    "top500": {"rank": [1, 500]}
+}
+
+# 支持的条件
+FILTER_KEYS = ('country', 'region', 'rank', 'min_score', 'max_score')
+
+
+def compile_filter(spec):
+    """
+    把过滤条件编译成判断函数，所有条件同时满足时返回True
+
+    Args:
+        spec (dict): 过滤条件
+            country (list): 国家/地区，记录的country在其中
+            region (list): 所在大洲，记录的region在其中
+            rank (list): [最高名次, 最低名次]，排名区间的起点落在其中（包含两端），没有排名的不满足
+            min_score / max_score (float): 分数范围（包含两端），没有具体分数的不满足
+
+    Returns:
+        function: 接收一条记录，返回是否满足条件
+    """
+    unknown_keys = set(spec) - set(FILTER_KEYS)
+    if unknown_keys:
+        raise ValueError(f"不支持的过滤条件: {', '.join(sorted(unknown_keys))}，可选: {', '.join(FILTER_KEYS)}")
+
+    predicates = []
+    # 集合在编译时建好，判断每条记录时只做一次哈希查找
+    if 'country' in spec:
+        countries = frozenset(spec['country'])
+        predicates.append(lambda record: record.get('country') in countries)
+    if 'region' in spec:
+        regions = frozenset(spec['region'])
+        predicates.append(lambda record: record.get('region') in regions)
+    if 'rank' in spec:
+        highest, lowest = spec['rank']
+
+        def rank_in_range(record):
+            rank_low = parse_rank(record.get('rank'))[0]
+            return rank_low != UNRANKED and highest <= rank_low <= lowest
+        predicates.append(rank_in_range)
+    if 'min_score' in spec or 'max_score' in spec:
+        min_score = spec.get('min_score', -math.inf)
+        max_score = spec.get('max_score', math.inf)
+        predicates.append(lambda record: min_score <= parse_score(record.get('overall_score')) <= max_score)
+
+    if len(predicates) == 1:
+        return predicates[0]
+    return lambda record: all(predicate(record) for predicate in predicates)
+
+
+def load_filter_specs(path=None):
+    """
+    读取所有过滤器的条件：内置过滤器加上 data/filters.json 中的自定义过滤器
+
+    Returns:
+        dict: {过滤器名: 过滤条件}
+    """
+    specs = dict(DEFAULT_FILTERS)
+    path = Path(path or FILTERS_PATH)
+    if path.exists():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                specs.update(json.load(f))
+        except Exception as e:
+            print(f"读取过滤器配置 {path} 时出错，只使用内置过滤器: {e}")
+    return specs
+
+
+def compile_filters(specs):
+    """
+    编译多个命名过滤器
+
+    Args:
+        specs (dict): {过滤器名: 过滤条件}
+
+    Returns:
+        dict: {过滤器名: 判断函数}
+    """
+    return {name: compile_filter(spec) for name, spec in specs.items()}
+
+
+def split_records(records, filters):
+    """
+    一次遍历把记录分发到满足条件的各个过滤器
+
+    Args:
+        records (iterable): 记录
+        filters (dict): {过滤器名: 判断函数}
+
+    Yields:
+        tuple: (记录, 满足条件的过滤器名列表)
+    """
+    items = list(filters.items())
+    for record in records:
+        yield record, [name for name, predicate in items if predicate(record)]
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+展示页面的搜索索引
+功能：为所有大学的中文名、英文名和拼音预先建立n-gram/前缀倒排索引，写入 data/display/search_index.json，
+页面加载索引后按词查找候选大学，不需要在每次输入时遍历全部数据
+"""
+
+import gzip
+import json
+import re
+
+try:
+    # 可选依赖：安装后索引中包含拼音，可以用 beijing、bjdx 等搜索
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+
+# 英文名、拼音只索引前这么多个字符的前缀，更长的查询词由页面用原文校验
+MAX_PREFIX_LENGTH = 12
+
+# 索引格式版本，页面据此判断是否能使用
+INDEX_VERSION = 1
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def get_pinyin(name):
+    """
+    获取中文名的拼音音节
+
+    Returns:
+        list: 音节列表，如 ['bei', 'jing', 'da', 'xue']，没有安装pypinyin时返回空列表
+    """
+    if lazy_pinyin is None:
+        return []
+    return [syllable.lower() for syllable in lazy_pinyin(name) if WORD_PATTERN.fullmatch(syllable.lower())]
+
+
+def chinese_grams(name):
+    """中文名的单字和相邻两字"""
+    chars = [char for char in name if not char.isspace()]
+    grams = set(chars)
+    grams.update(a + b for a, b in zip(chars, chars[1:]))
+    return grams
+
+
+def prefix_grams(text):
+    """text的所有前缀（最长 MAX_PREFIX_LENGTH 个字符）"""
+    return {text[:length] for length in range(1, min(len(text), MAX_PREFIX_LENGTH) + 1)}
+
+
+def latin_grams(title, syllables):
+    """
+    英文名和拼音的前缀
+    - 英文名每个单词的前缀；
+    - 拼音从每个音节开始连续拼写的前缀，beijing、jingda 都能命中北京大学；
+    - 拼音首字母的前缀，如 bjdx。
+    """
+    grams = set()
+    for word in WORD_PATTERN.findall(title.lower()):
+        grams |= prefix_grams(word)
+    for start in range(len(syllables)):
+        grams |= prefix_grams(''.join(syllables[start:]))
+    if syllables:
+        grams |= prefix_grams(''.join(syllable[0] for syllable in syllables))
+    return grams
+
+
+def build_search_index(titles):
+    """
+    建立搜索索引
+
+    Args:
+        titles (dict): {中文名: 英文名}
+
+    Returns:
+        dict: 索引数据
+            entries: [[中文名, 英文名, 拼音], ...]
+            grams: {n-gram或前缀: [entries中的序号, ...]}
+    """
+    entries = []
+    grams = {}
+    for entry_id, name in enumerate(sorted(titles)):
+        title = titles[name] or ''
+        syllables = get_pinyin(name)
+        entries.append([name, title, ' '.join(syllables)])
+        for gram in chinese_grams(name) | latin_grams(title, syllables):
+            grams.setdefault(gram, []).append(entry_id)
+
+    return {
+        'version': INDEX_VERSION,
+        'max_prefix_length': MAX_PREFIX_LENGTH,
+        'entries': entries,
+        'grams': dict(sorted(grams.items()))
+    }
+
+
+def load_search_titles(index_file):
+    """
+    读取已有索引中的 {中文名: 英文名}，增量构建时沿用未重新处理的年份的英文名
+
+    Returns:
+        dict: 文件不存在或读取失败时返回空字典
+    """
+    if not index_file.exists():
+        return {}
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        return {name: title for name, title, *_ in index.get('entries', [])}
+    except Exception as e:
+        print(f"读取搜索索引 {index_file} 时出错: {e}")
+        return {}
+
+
+def save_search_index(all_display_data, titles, display_dir):
+    """
+    生成 search_index.json
+
+    Args:
+        all_display_data (list): 所有年份的展示数据
+        titles (dict): 本次处理的年份中 {中文名: 英文名}，其他大学的英文名从已有索引中读取
+        display_dir (Path): 展示数据目录
+    """
+    index_file = display_dir / "search_index.json"
+    known_titles = load_search_titles(index_file)
+    known_titles.update(titles)
+    # 只保留展示数据中还存在的大学
+    names = {item['name'] for item in all_display_data}
+    index = build_search_index({name: known_titles.get(name, '') for name in names})
+
+    if lazy_pinyin is None:
+        print("未安装pypinyin，搜索索引中不包含拼音: pip install pypinyin")
+
+    content = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    index_file.write_bytes(content)
+    # 与年份分片一样提供预压缩文件
+    index_file.with_name(index_file.name + '.gz').write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+    print(f"搜索索引: {len(index['entries'])} 所大学，{len(index['grams'])} 个索引词 -> {index_file}")
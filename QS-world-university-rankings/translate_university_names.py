@@ -5,18 +5,171 @@
 支持多种翻译方案：百度翻译API、Google翻译、有道翻译等
 """
 
+import bisect
 import json
-import requests
 import hashlib
+import os
 import random
+import sys
 import time
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.http import HttpClient
+from utils.rate_limit import RateLimiter
+from build_manifest import BuildManifest
+from parallel import DEFAULT_JOBS, get_jobs_option, iter_years, strip_jobs_option
+
+
+# 在线翻译结果的缓存文件
+TRANSLATION_CACHE_PATH = Path(__file__).parent / "data" / "translation_cache.json"
+# 人工校对过的补充映射，翻译器初始化时自动加载
+CUSTOM_MAPPING_PATH = Path(__file__).parent / "data" / "custom_mapping.json"
+
+
+class TranslationRequestError(Exception):
+    """在线翻译请求失败（网络错误、HTTP错误、接口返回错误码等），与接口明确没有译文不同，结果不缓存"""
+
+
+class TranslationCache:
+    """
+    在线翻译结果的持久化缓存
+    以 翻译方法:标准化名称 为键保存翻译结果，调用在线接口前先查缓存。
+    接口明确没有译文的结果也会缓存（负缓存），过期后才会重新请求；请求出错时不缓存，下次重新请求。
+    """
+    # 没有译文的结果保留时间（秒）
+    NEGATIVE_TTL = 7 * 24 * 3600
+    # 翻译成功的结果保留时间（秒），None表示永久有效
+    POSITIVE_TTL = None
+    
+    def __init__(self, path=None, negative_ttl=None, positive_ttl=None, read_only=False):
+        """
+        Args:
+            path (str): 缓存文件路径
+            negative_ttl (float): 没有译文的结果的保留时间（秒）
+            positive_ttl (float): 翻译成功结果的保留时间（秒）
+            read_only (bool): 为True时不写回文件，新增的结果通过 pop_updates 取出交给主进程合并
+        """
+        self.path = Path(path or TRANSLATION_CACHE_PATH)
+        self.negative_ttl = negative_ttl or self.NEGATIVE_TTL
+        self.positive_ttl = positive_ttl or self.POSITIVE_TTL
+        self.read_only = read_only
+        self.entries = {}
+        self.updated_keys = set()
+        self.dirty = False
+        
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"读取翻译缓存 {self.path} 失败，将重新建立缓存: {e}")
+    
+    @staticmethod
+    def make_key(normalized_name, method):
+        """生成缓存键"""
+        return f"{method}:{normalized_name}"
+    
+    def get(self, normalized_name, method):
+        """
+        查询缓存
+        
+        Returns:
+            tuple: (是否命中, 翻译结果)，翻译结果为None表示接口没有给出译文
+        """
+        entry = self.entries.get(self.make_key(normalized_name, method))
+        if entry is None:
+            return False, None
+        ttl = self.positive_ttl if entry['result'] else self.negative_ttl
+        if ttl is not None and time.time() - entry['time'] > ttl:
+            return False, None
+        return True, entry['result']
+    
+    def set(self, normalized_name, method, result):
+        """保存翻译结果，result为None表示接口没有给出译文"""
+        self.entries[self.make_key(normalized_name, method)] = {
+            'name': normalized_name,
+            'method': method,
+            'result': result,
+            'time': time.time()
+        }
+        self.updated_keys.add(self.make_key(normalized_name, method))
+        self.dirty = True
+    
+    def pop_updates(self):
+        """
+        取出上次调用以来新增或更新的条目
+        
+        Returns:
+            dict: {缓存键: 条目}
+        """
+        updates = {key: self.entries[key] for key in self.updated_keys}
+        self.updated_keys.clear()
+        return updates
+    
+    def merge(self, updates):
+        """合并其他进程新增的条目，同一个键保留较新的结果"""
+        for key, entry in updates.items():
+            current = self.entries.get(key)
+            if current is None or entry['time'] >= current['time']:
+                self.entries[key] = entry
+                self.dirty = True
+    
+    def save(self):
+        """写回缓存文件，先写临时文件再替换，避免中断时损坏缓存"""
+        if not self.dirty or self.read_only:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+    
+    def export_translations(self, output_file):
+        """
+        导出翻译成功的结果，格式为 {英文校名: 中文校名}，
+        人工校对后可以通过 --import-mapping 合并到补充映射中
+        
+        Returns:
+            int: 导出的条数
+        """
+        translations = {}
+        for entry in sorted(self.entries.values(), key=lambda e: e['name']):
+            if entry['result']:
+                translations.setdefault(entry['name'], entry['result'])
+        
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(translations, f, ensure_ascii=False, indent=2)
+        return len(translations)
+
+
+
+# 支持的在线翻译方法
+ONLINE_METHODS = ('baidu', 'youdao', 'google')
+
 
 class UniversityNameTranslator:
     """大学名称翻译器"""
+    # 在线翻译接口每秒最多请求数
+    ONLINE_RATE = 5
+    # 百度翻译单次请求的最大字节数和最大行数
+    BAIDU_BATCH_BYTES = 6000
+    BAIDU_BATCH_SIZE = 100
     
-    def __init__(self):
+    def __init__(self, translation_cache=None, online_rate=None):
+        """
+        Args:
+            translation_cache (TranslationCache): 在线翻译结果缓存，默认使用 data/translation_cache.json
+            online_rate (float): 在线翻译接口每秒最多请求数，默认 ONLINE_RATE
+        """
+        self.translation_cache = translation_cache or TranslationCache()
+        
+        # 在线翻译接口共用的HTTP客户端，按主机限速，遇到限流时自动退避
+        self.http_client = HttpClient(rate_limiter=RateLimiter(rate=online_rate or self.ONLINE_RATE))
+        # 在线翻译请求失败（没有缓存）的名称，调用方据此决定是否把结果记为最新
+        self.failed_names = set()
+        
         # 预定义的大学名称映射（常见大学的标准中文翻译）
         self.university_mapping = {
             # 美国大学
@@ -177,6 +330,68 @@ class UniversityNameTranslator:
             "University of Toronto": "多伦多大学",
             "McGill University": "麦吉尔大学",
         }
+        
+        # 人工校对过的补充映射
+        self.load_custom_mapping()
+        
+        self.build_index()
+    
+    def load_custom_mapping(self, mapping_file=None):
+        """
+        加载补充映射，合并到university_mapping中（同名时覆盖）
+        
+        Args:
+            mapping_file (str): 映射文件路径，格式为 {英文校名: 中文校名}，默认 data/custom_mapping.json
+        """
+        mapping_file = Path(mapping_file or CUSTOM_MAPPING_PATH)
+        if not mapping_file.exists():
+            return
+        try:
+            with open(mapping_file, 'r', encoding='utf-8') as f:
+                self.university_mapping.update(json.load(f))
+        except Exception as e:
+            print(f"加载补充映射 {mapping_file} 失败: {e}")
+    
+    def build_index(self):
+        """
+        根据university_mapping构建查找索引，修改映射表后需要重新调用
+        
+        索引都记录映射表中的序号，多个条目匹配时取序号最小的，与按顺序遍历映射表的结果一致：
+        - exact_index: 标准化名称 -> 序号
+        - clean_index: 去除括号内容后的名称 -> 序号
+        - suffixes/suffix_positions: 所有标准化名称的全部后缀（排序后）及其序号，
+          以某个字符串开头的后缀是连续的一段，二分查找即可找出包含该子串（含以它开头）的名称
+        """
+        self.index_translations = []
+        self.exact_index = {}
+        self.clean_index = {}
+        suffix_pairs = []
+        
+        for position, (eng_name, chi_name) in enumerate(self.university_mapping.items()):
+            normalized_mapping = self.normalize_university_name(eng_name)
+            clean_eng_name = normalized_mapping.split('(')[0].strip()
+            
+            self.index_translations.append(chi_name)
+            self.exact_index.setdefault(normalized_mapping, position)
+            self.clean_index.setdefault(clean_eng_name, position)
+            suffix_pairs.extend((normalized_mapping[start:], position) for start in range(len(normalized_mapping)))
+        
+        suffix_pairs.sort()
+        self.suffixes = [suffix for suffix, _ in suffix_pairs]
+        self.suffix_positions = [position for _, position in suffix_pairs]
+        
+        # 查找结果缓存：标准化名称 -> 中文校名（或None）
+        self.lookup_cache = {}
+    
+    def find_substring_position(self, text):
+        """
+        在映射表中查找包含text的名称，返回最小序号，找不到返回None
+        """
+        start = bisect.bisect_left(self.suffixes, text)
+        end = bisect.bisect_left(self.suffixes, text + chr(0x10FFFF), lo=start)
+        if start == end:
+            return None
+        return min(self.suffix_positions[start:end])
     
     def normalize_university_name(self, name):
         """
@@ -207,49 +422,49 @@ class UniversityNameTranslator:
         # 标准化输入名称
         normalized_input = self.normalize_university_name(english_name)
         
+        if normalized_input in self.lookup_cache:
+            return self.lookup_cache[normalized_input]
+        
         # 直接匹配（标准化后）
-        for eng_name, chi_name in self.university_mapping.items():
-            normalized_mapping = self.normalize_university_name(eng_name)
-            if normalized_input == normalized_mapping:
-                return chi_name
+        position = self.exact_index.get(normalized_input)
         
-        # 模糊匹配（去除括号内容和尾部空格）
-        clean_name = normalized_input.split('(')[0].strip()
-        for eng_name, chi_name in self.university_mapping.items():
-            normalized_mapping = self.normalize_university_name(eng_name)
-            clean_eng_name = normalized_mapping.split('(')[0].strip()
-            if clean_name == clean_eng_name or clean_name in normalized_mapping or normalized_mapping.startswith(clean_name):
-                return chi_name
+        # 模糊匹配（去除括号内容和尾部空格）：去括号后相同，或是映射表名称的一部分
+        if position is None:
+            clean_name = normalized_input.split('(')[0].strip()
+            candidates = [self.clean_index.get(clean_name), self.find_substring_position(clean_name)]
+            candidates = [candidate for candidate in candidates if candidate is not None]
+            position = min(candidates) if candidates else None
         
-        return None
+        result = self.index_translations[position] if position is not None else None
+        self.lookup_cache[normalized_input] = result
+        return result
     
-    def translate_with_baidu(self, text, app_id=None, secret_key=None):
+    def request_baidu(self, query, app_id, secret_key):
         """
-        使用百度翻译API进行翻译
+        调用百度翻译API，query可以包含多行，每行单独翻译
         
         Args:
-            text (str): 要翻译的文本
+            query (str): 要翻译的文本，多行用换行符分隔
             app_id (str): 百度翻译API的APP ID
             secret_key (str): 百度翻译API的密钥
             
         Returns:
-            str or None: 翻译结果
+            list: trans_result列表，每行一项 {'src': 原文, 'dst': 译文}
+            
+        Raises:
+            TranslationRequestError: 请求失败或接口返回错误码
         """
-        if not app_id or not secret_key:
-            print("需要提供百度翻译API的APP ID和密钥")
-            return None
-        
         url = 'https://fanyi-api.baidu.com/api/trans/vip/translate'
         from_lang = 'en'
         to_lang = 'zh'
         salt = random.randint(32768, 65536)
         
         # 构建签名
-        sign_str = app_id + text + str(salt) + secret_key
+        sign_str = app_id + query + str(salt) + secret_key
         sign = hashlib.md5(sign_str.encode('utf-8')).hexdigest()
         
-        params = {
-            'q': text,
+        data = {
+            'q': query,
             'from': from_lang,
             'to': to_lang,
             'appid': app_id,
@@ -258,17 +473,123 @@ class UniversityNameTranslator:
         }
         
         try:
-            response = requests.get(url, params=params)
+            # 多行查询可能较长，使用POST避免URL超长
+            response = self.http_client.post(url, data=data)
+            response.raise_for_status()
             result = response.json()
+        except Exception as e:
+            raise TranslationRequestError(f"百度翻译API调用失败: {e}") from e
+        
+        if 'trans_result' not in result:
+            raise TranslationRequestError(f"百度翻译API错误: {result}")
+        return result['trans_result']
+    
+    def translate_with_baidu(self, text, app_id=None, secret_key=None):
+        """
+        使用百度翻译API进行翻译
+        
+        Args:
+            text (str): 要翻译的文本
+            app_id (str): 百度翻译API的APP ID
+            secret_key (str): 百度翻译API的密钥
+            
+        Returns:
+            str or None: 翻译结果，接口没有给出译文时为None
             
-            if 'trans_result' in result:
-                return result['trans_result'][0]['dst']
+        Raises:
+            TranslationRequestError: 缺少API密钥或请求失败
+        """
+        if not app_id or not secret_key:
+            raise TranslationRequestError("需要提供百度翻译API的APP ID和密钥")
+        
+        trans_result = self.request_baidu(text, app_id, secret_key)
+        return trans_result[0]['dst'] if trans_result else None
+    
+    def translate_batch_with_baidu(self, texts, app_id=None, secret_key=None):
+        """
+        使用百度翻译API批量翻译，多个文本用换行符拼成一个请求
+        
+        Args:
+            texts (list): 要翻译的文本列表（不能包含换行符）
+            app_id (str): 百度翻译API的APP ID
+            secret_key (str): 百度翻译API的密钥
+            
+        Returns:
+            dict: {原文: 译文}，接口没有给出译文的原文对应None，请求失败的批次不在结果中
+        """
+        if not app_id or not secret_key:
+            print("需要提供百度翻译API的APP ID和密钥")
+            return {}
+        
+        results = {}
+        for batch in self.split_batches(texts):
+            try:
+                trans_result = self.request_baidu('\n'.join(batch), app_id, secret_key)
+            except TranslationRequestError as e:
+                print(f"{e}，这一批 {len(batch)} 个名称下次重新翻译")
+                continue
+            # 正常情况下每行对应一条结果，数量不一致时按原文回填
+            if len(trans_result) == len(batch):
+                translated = {text: item['dst'] for text, item in zip(batch, trans_result)}
             else:
-                print(f"百度翻译API错误: {result}")
-                return None
-        except Exception as e:
-            print(f"百度翻译API调用失败: {e}")
-            return None
+                translated = {item['src']: item['dst'] for item in trans_result}
+            for text in batch:
+                results[text] = translated.get(text)
+            print(f"百度批量翻译: {len(batch)} 个名称，成功 {sum(1 for text in batch if results[text])} 个")
+        return results
+    
+    def split_batches(self, texts):
+        """按百度翻译的单次请求长度限制把文本分批"""
+        batch = []
+        batch_bytes = 0
+        for text in texts:
+            text_bytes = len(text.encode('utf-8')) + 1
+            if batch and (batch_bytes + text_bytes > self.BAIDU_BATCH_BYTES or len(batch) >= self.BAIDU_BATCH_SIZE):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(text)
+            batch_bytes += text_bytes
+        if batch:
+            yield batch
+    
+    def prefetch_translations(self, english_names, method='baidu', **kwargs):
+        """
+        预翻译：对预定义映射和缓存中都没有的名称去重后在线翻译，结果写入缓存，
+        之后逐个翻译时直接命中缓存。'baidu' 批量请求，其他方法逐个请求
+        
+        Args:
+            english_names (iterable): 英文校名
+            method (str): 翻译方法 ('baidu', 'youdao', 'google')
+            **kwargs: 其他参数（如百度翻译的API密钥）
+            
+        Returns:
+            int: 实际在线翻译的名称数量
+        """
+        pending = {}
+        for english_name in english_names:
+            if not english_name or self.get_predefined_translation(english_name):
+                continue
+            normalized_name = self.normalize_university_name(english_name)
+            hit, _ = self.translation_cache.get(normalized_name, method)
+            if not hit:
+                pending.setdefault(normalized_name, english_name)
+        
+        if not pending:
+            return 0
+        
+        print(f"共有 {len(pending)} 个名称需要在线翻译...")
+        try:
+            if method == 'baidu':
+                results = self.translate_batch_with_baidu(list(pending), **kwargs)
+                for normalized_name, result in results.items():
+                    self.translation_cache.set(normalized_name, method, result)
+            else:
+                for english_name in pending.values():
+                    self.translate_online(english_name, method, **kwargs)
+        finally:
+            self.translation_cache.save()
+        return len(pending)
     
     def translate_with_youdao(self, text):
         """
@@ -278,7 +599,10 @@ class UniversityNameTranslator:
             text (str): 要翻译的文本
             
         Returns:
-            str or None: 翻译结果
+            str or None: 翻译结果，接口没有给出译文时为None
+            
+        Raises:
+            TranslationRequestError: 请求失败或接口返回错误码
         """
         url = 'http://fanyi.youdao.com/translate'
         data = {
@@ -293,17 +617,18 @@ class UniversityNameTranslator:
         }
         
         try:
-            response = requests.post(url, data=data)
+            response = self.http_client.post(url, data=data)
+            response.raise_for_status()
             result = response.json()
-            
-            if 'translateResult' in result and result['translateResult']:
-                return result['translateResult'][0][0]['tgt']
-            else:
-                print(f"有道翻译错误: {result}")
-                return None
         except Exception as e:
-            print(f"有道翻译调用失败: {e}")
-            return None
+            raise TranslationRequestError(f"有道翻译调用失败: {e}") from e
+        
+        if result.get('errorCode', 0) != 0:
+            raise TranslationRequestError(f"有道翻译错误: {result}")
+        if result.get('translateResult'):
+            return result['translateResult'][0][0]['tgt'] or None
+        print(f"有道翻译没有给出译文: {text}")
+        return None
     
     def translate_with_googletrans(self, text):
         """
@@ -313,27 +638,30 @@ class UniversityNameTranslator:
             text (str): 要翻译的文本
             
         Returns:
-            str or None: 翻译结果
+            str or None: 翻译结果，没有译文时为None
+            
+        Raises:
+            TranslationRequestError: 没有安装googletrans或请求失败
         """
         try:
             from googletrans import Translator
+        except ImportError as e:
+            raise TranslationRequestError("需要安装googletrans库: pip install googletrans==4.0.0-rc1") from e
+        try:
             translator = Translator()
             result = translator.translate(text, src='en', dest='zh')
-            return result.text
-        except ImportError:
-            print("需要安装googletrans库: pip install googletrans==4.0.0-rc1")
-            return None
         except Exception as e:
-            print(f"Google翻译调用失败: {e}")
-            return None
+            raise TranslationRequestError(f"Google翻译调用失败: {e}") from e
+        return result.text or None
     
-    def translate_university_name(self, english_name, method='predefined', **kwargs):
+    def translate_university_name(self, english_name, method='predefined', fallback='youdao', **kwargs):
         """
         翻译大学名称
         
         Args:
             english_name (str): 英文校名
             method (str): 翻译方法 ('predefined', 'baidu', 'youdao', 'google')
+            fallback (str): predefined方法未找到时使用的在线翻译方法
             **kwargs: 其他参数（如百度翻译的API密钥）
             
         Returns:
@@ -346,21 +674,66 @@ class UniversityNameTranslator:
             else:
                 # 如果预定义中没有，则尝试其他方法
                 print(f"预定义映射中未找到 '{english_name}'，尝试在线翻译...")
-                return self.translate_university_name(english_name, method='youdao')
+                return self.translate_university_name(english_name, method=fallback, **kwargs)
         
-        elif method == 'baidu':
-            return self.translate_with_baidu(english_name, **kwargs)
-        
-        elif method == 'youdao':
-            return self.translate_with_youdao(english_name)
-        
-        elif method == 'google':
-            return self.translate_with_googletrans(english_name)
+        elif method in ONLINE_METHODS:
+            return self.translate_online(english_name, method, **kwargs)
         
         else:
             print(f"不支持的翻译方法: {method}")
             return english_name
     
+    def translate_online(self, english_name, method, **kwargs):
+        """
+        在线翻译，优先使用缓存，缓存未命中时才调用翻译接口并缓存结果
+        接口明确没有译文时也缓存，请求出错时不缓存，下次重新请求
+        
+        Args:
+            english_name (str): 英文校名
+            method (str): 翻译方法 ('baidu', 'youdao', 'google')
+            **kwargs: 其他参数（如百度翻译的API密钥）
+            
+        Returns:
+            str or None: 中文校名
+        """
+        normalized_name = self.normalize_university_name(english_name)
+        hit, result = self.translation_cache.get(normalized_name, method)
+        if hit:
+            return result
+        
+        try:
+            if method == 'baidu':
+                result = self.translate_with_baidu(english_name, **kwargs)
+            elif method == 'youdao':
+                result = self.translate_with_youdao(english_name)
+            else:
+                result = self.translate_with_googletrans(english_name)
+        except TranslationRequestError as e:
+            print(e)
+            self.failed_names.add(normalized_name)
+            return None
+        
+        self.translation_cache.set(normalized_name, method, result)
+        return result
+    
+    def translate_record(self, university, method='predefined', **kwargs):
+        """
+        翻译单条大学数据，把中文名写入title_zh字段
+        
+        Args:
+            university (dict): 大学数据
+            method (str): 翻译方法
+            **kwargs: 其他参数
+            
+        Returns:
+            bool: 是否有英文名需要翻译
+        """
+        english_name = university.get('title', '')
+        if not english_name:
+            return False
+        university['title_zh'] = self.translate_university_name(english_name, method, **kwargs)
+        return True
+    
     def translate_university_data(self, input_file, output_file, method='predefined', **kwargs):
         """
         批量翻译大学数据文件中的大学名称
@@ -370,6 +743,9 @@ class UniversityNameTranslator:
             output_file (str): 输出文件路径
             method (str): 翻译方法
             **kwargs: 其他参数
+            
+        Returns:
+            bool: 是否翻译并保存成功
         """
         try:
             with open(input_file, 'r', encoding='utf-8') as f:
@@ -378,31 +754,67 @@ class UniversityNameTranslator:
             print(f"开始翻译 {len(universities)} 所大学的名称...")
             
             for i, university in enumerate(universities):
-                english_name = university.get('title', '')
-                if english_name:
-                    # 翻译大学名称
-                    chinese_name = self.translate_university_name(english_name, method, **kwargs)
-                    university['title_zh'] = chinese_name
-                    
-                    print(f"{i+1:3d}. {english_name} -> {chinese_name}")
-                    
-                    # 添加延时，避免API限制
-                    if method in ['youdao', 'baidu'] and i % 10 == 9:
-                        time.sleep(1)
+                if self.translate_record(university, method, **kwargs):
+                    print(f"{i+1:3d}. {university['title']} -> {university['title_zh']}")
             
             # 保存结果
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(universities, f, ensure_ascii=False, indent=2)
             
             print(f"翻译完成！结果已保存到 {output_file}")
+            return True
             
         except Exception as e:
             print(f"批量翻译失败: {e}")
+            return False
+        finally:
+            # 即使中途出错，已经拿到的在线翻译结果也保留下来
+            self.translation_cache.save()
+
 
+# 子进程中使用的翻译器，由 init_translate_worker 创建
+worker_translator = None
 
-def process_all_parsed_files():
+
+def init_translate_worker(online_rate):
+    """
+    在每个处理进程中创建一次翻译器
+    翻译缓存只读，新增的在线翻译结果随处理结果返回给主进程，由主进程在每个年份完成时合并保存
+    
+    Args:
+        online_rate (float): 该进程的在线翻译限速，所有进程加起来不超过 ONLINE_RATE
+    """
+    global worker_translator
+    worker_translator = UniversityNameTranslator(TranslationCache(read_only=True), online_rate=online_rate)
+
+
+def translate_year_file(task):
+    """
+    翻译单个年份的文件，可以在子进程中执行
+    
+    Args:
+        task (tuple): (输入文件, 输出文件, 在线翻译方法, 其他参数)
+        
+    Returns:
+        tuple: (是否成功, 新增的翻译缓存条目, 在线翻译请求失败的名称数)
+    """
+    input_file, output_file, fallback, kwargs = task
+    worker_translator.failed_names.clear()
+    success = worker_translator.translate_university_data(input_file, output_file, method='predefined',
+                                                          fallback=fallback, **kwargs)
+    return success, worker_translator.translation_cache.pop_updates(), len(worker_translator.failed_names)
+
+
+def process_all_parsed_files(fallback='youdao', force=False, jobs=DEFAULT_JOBS, **kwargs):
     """
     处理 data/parsed 目录下的所有文件，添加中文翻译
+    输入文件和翻译映射表都没有变化的年份直接跳过
+    
+    Args:
+        fallback (str): 预定义映射中没有时使用的在线翻译方法
+        force (bool): 是否忽略构建清单，重新翻译所有年份
+        jobs (int): 同时翻译的年份数（进程数），在线翻译的总限速不变
+        **kwargs: 其他参数（如百度翻译的API密钥）
     """
     translator = UniversityNameTranslator()
     script_dir = Path(__file__).parent
@@ -419,24 +831,101 @@ def process_all_parsed_files():
         print("未找到需要翻译的JSON文件")
         return
     
+    # 映射表或在线翻译方法变化时需要重新翻译
+    manifest = BuildManifest(force=force)
+    params = {'mapping': translator.university_mapping, 'fallback': fallback}
+    
+    def get_output_file(input_file):
+        return parsed_dir / f"{input_file.stem}_with_chinese.json"
+    
+    skipped_files = [f for f in json_files
+                     if manifest.is_up_to_date('translate', f.stem, [f], [get_output_file(f)], params)]
+    for input_file in skipped_files:
+        print(f"{input_file.name} 没有变化，跳过")
+    json_files = sorted(f for f in json_files if f not in skipped_files)
+    
+    if not json_files:
+        manifest.save()
+        print("所有文件都是最新的，无需翻译")
+        return
+    
     print(f"找到 {len(json_files)} 个文件需要翻译")
     
-    for input_file in sorted(json_files):
-        year = input_file.stem  # 获取文件名（不含扩展名）
-        output_file = parsed_dir / f"{year}_with_chinese.json"
-        
-        print(f"\n处理文件: {input_file.name}")
-        
-        try:
-            translator.translate_university_data(input_file, output_file, method='predefined')
-            print(f"✅ 成功翻译并保存到: {output_file.name}")
-        except Exception as e:
-            print(f"❌ 处理文件 {input_file.name} 时出错: {e}")
+    # 先在主进程中把所有年份中的未知名称去重后在线翻译，各年份翻译时直接命中缓存，
+    # 同一个名称不会在多个进程中重复请求（只有请求失败、没有缓存的名称会在各年份中再次尝试）
+    english_names = []
+    for input_file in json_files:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            english_names.extend(university.get('title', '') for university in json.load(f))
+    translator.prefetch_translations(english_names, method=fallback, **kwargs)
+    
+    # 各年份并行翻译，限速按进程数平分；每个年份完成时把新增的在线翻译结果合并到主进程的缓存并保存
+    tasks = [(input_file, get_output_file(input_file), fallback, kwargs) for input_file in json_files]
+    online_rate = UniversityNameTranslator.ONLINE_RATE / max(1, min(jobs, len(tasks)))
+    try:
+        results = iter_years(translate_year_file, tasks, jobs, initializer=init_translate_worker,
+                             initargs=(online_rate,))
+        for (input_file, output_file, _, _), (success, updates, failed_count) in zip(tasks, results):
+            translator.translation_cache.merge(updates)
+            translator.translation_cache.save()
+            if success and failed_count:
+                # 有名称没有翻译成功，不记录到构建清单，下次运行时重新翻译该年份
+                print(f"⚠️ {output_file.name} 已保存，但有 {failed_count} 个名称在线翻译请求失败，下次运行时重新翻译")
+            elif success:
+                manifest.record('translate', input_file.stem, [input_file], [output_file], params)
+                print(f"✅ 成功翻译并保存到: {output_file.name}")
+            else:
+                print(f"❌ 处理文件 {input_file.name} 时出错")
+    except Exception as e:
+        print(f"❌ 批量翻译时出错: {e}")
+        return
+    finally:
+        # 已经完成的年份照常记录，下次运行时跳过
+        manifest.save()
     
     print(f"\n🎉 批量翻译完成！共处理了 {len(json_files)} 个文件")
 
 
-def main():
+def import_mapping(mapping_file):
+    """
+    把人工校对过的映射文件合并到补充映射 data/custom_mapping.json 中
+    
+    Args:
+        mapping_file (str): 映射文件路径，格式为 {英文校名: 中文校名}
+    """
+    with open(mapping_file, 'r', encoding='utf-8') as f:
+        new_mapping = json.load(f)
+    
+    custom_mapping = {}
+    if CUSTOM_MAPPING_PATH.exists():
+        with open(CUSTOM_MAPPING_PATH, 'r', encoding='utf-8') as f:
+            custom_mapping = json.load(f)
+    custom_mapping.update(new_mapping)
+    
+    CUSTOM_MAPPING_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(CUSTOM_MAPPING_PATH, 'w', encoding='utf-8') as f:
+        json.dump(custom_mapping, f, ensure_ascii=False, indent=2)
+    
+    print(f"已合并 {len(new_mapping)} 条映射到 {CUSTOM_MAPPING_PATH}（共 {len(custom_mapping)} 条）")
+
+
+def get_baidu_credentials():
+    """
+    从仓库根目录的config.ini中读取百度翻译API的密钥，格式：
+        [baidu_translate]
+        app_id = xxx
+        secret_key = xxx
+    """
+    from utils.config_parser import ConfigParser
+    parser = ConfigParser()
+    parser.read_config()
+    return {
+        'app_id': parser.get_option('baidu_translate', 'app_id'),
+        'secret_key': parser.get_option('baidu_translate', 'secret_key')
+    }
+
+
+def main(force=False, jobs=DEFAULT_JOBS):
     """主函数"""
     translator = UniversityNameTranslator()
     
@@ -453,11 +942,37 @@ def main():
     for name in test_names:
         chinese_name = translator.translate_university_name(name)
         print(f"{name} -> {chinese_name}")
+    translator.translation_cache.save()
     
     print("\n=== 批量翻译所有文件 ===")
     # 批量处理所有解析后的文件
-    process_all_parsed_files()
+    process_all_parsed_files(force=force, jobs=jobs)
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # --force 忽略构建清单重新翻译所有年份，--jobs N 同时翻译N个年份
+    force = '--force' in sys.argv
+    try:
+        jobs = get_jobs_option(sys.argv)
+    except ValueError as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+    args = [arg for arg in strip_jobs_option(sys.argv[1:]) if arg != '--force']
+    
+    if args:
+        if args[0] == "--export-cache":
+            output_file = args[1] if len(args) > 1 else "translation_export.json"
+            count = TranslationCache().export_translations(output_file)
+            print(f"已导出 {count} 条在线翻译结果到 {output_file}，校对后可用 --import-mapping 导入")
+        elif args[0] == "--import-mapping" and len(args) > 1:
+            import_mapping(args[1])
+        elif args[0] == "--baidu":
+            process_all_parsed_files(fallback='baidu', force=force, jobs=jobs, **get_baidu_credentials())
+        else:
+            print("使用方法:")
+            print("  python translate_university_names.py [--force] [--jobs N]    # 翻译所有文件")
+            print("  python translate_university_names.py --baidu [--force]       # 未知名称使用百度翻译批量翻译")
+            print("  python translate_university_names.py --export-cache [文件]    # 导出在线翻译结果")
+            print("  python translate_university_names.py --import-mapping 文件    # 导入校对后的映射")
+    else:
+        main(force, jobs)
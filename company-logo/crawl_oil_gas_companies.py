@@ -5,97 +5,132 @@
 抓取 companiesmarketcap.com 网站上油气公司的名称和logo信息
 """
 
-import requests
 from bs4 import BeautifulSoup
+import argparse
 import json
-import time
 import os
+import re
+import sys
+from pathlib import Path
 from urllib.parse import urljoin
 
-def get_page_data(page_num):
-    """获取单页数据"""
-    url = f"https://companiesmarketcap.com/oil-gas/largest-oil-and-gas-companies-by-market-cap/?page={page_num}"
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.http import HttpClient
+from utils.http_cache import HttpCache
+from utils.pagination import PageCrawler
+from utils.rate_limit import RateLimiter
+
+BASE_URL = "https://companiesmarketcap.com/oil-gas/largest-oil-and-gas-companies-by-market-cap/"
+
+# 默认同时抓取的页面数
+DEFAULT_CONCURRENCY = 4
+# 默认每秒最多请求数
+DEFAULT_RATE = 1
+
+def get_page_url(page_num):
+    """生成指定页码的URL"""
+    return f"{BASE_URL}?page={page_num}"
+
+def parse_companies(html_content, page_num):
+    """解析单页HTML，返回公司列表"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    
+    # 查找marketcap-table表格
+    table = soup.find('table', class_='marketcap-table')
+    if not table:
+        print(f"第 {page_num} 页未找到marketcap-table表格")
+        return []
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    companies = []
     
-    try:
-        print(f"正在抓取第 {page_num} 页...")
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+    # 遍历表格中的每一行
+    rows = table.find_all('tr')
+    for row in rows:
+        # 查找包含公司信息的name-div
+        name_div = row.find('div', class_='name-div')
+        if not name_div:
+            continue
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # 获取公司名称
+        company_name_elem = name_div.find(class_='company-name')
+        if not company_name_elem:
+            continue
         
-        # 查找marketcap-table表格
-        table = soup.find('table', class_='marketcap-table')
-        if not table:
-            print(f"第 {page_num} 页未找到marketcap-table表格")
-            return []
+        company_name = company_name_elem.get_text(strip=True)
         
-        companies = []
+        # 获取公司logo - 查找class为company-logo的img标签
+        logo_url = ""
+        logo_elem = row.find('img', class_='company-logo')
         
-        # 遍历表格中的每一行
-        rows = table.find_all('tr')
-        for row in rows:
-            # 查找包含公司信息的name-div
-            name_div = row.find('div', class_='name-div')
-            if not name_div:
-                continue
-            
-            # 获取公司名称
-            company_name_elem = name_div.find(class_='company-name')
-            if not company_name_elem:
-                continue
-            
-            company_name = company_name_elem.get_text(strip=True)
-            
-            # 获取公司logo - 查找class为company-logo的img标签
-            logo_url = ""
-            logo_elem = row.find('img', class_='company-logo')
-            
-            if logo_elem and logo_elem.get('src'):
-                logo_url = logo_elem['src']
-                
-                # 处理相对路径
-                if logo_url.startswith('/'):
-                    logo_url = 'https://companiesmarketcap.com' + logo_url
-                elif not logo_url.startswith('http'):
-                    logo_url = 'https://companiesmarketcap.com/' + logo_url
+        if logo_elem and logo_elem.get('src'):
+            logo_url = logo_elem['src']
             
-            if company_name:
-                companies.append({
-                    'name': company_name,
-                    'logo': logo_url
-                })
-                print(f"  找到公司: {company_name} | Logo: {logo_url.split('/')[-1] if logo_url else 'N/A'}")
+            # 处理相对路径
+            if logo_url.startswith('/'):
+                logo_url = 'https://companiesmarketcap.com' + logo_url
+            elif not logo_url.startswith('http'):
+                logo_url = 'https://companiesmarketcap.com/' + logo_url
         
-        return companies
-        
-    except requests.RequestException as e:
-        print(f"请求第 {page_num} 页时出错: {e}")
-        return []
-    except Exception as e:
-        print(f"解析第 {page_num} 页时出错: {e}")
-        return []
+        if company_name:
+            companies.append({
+                'name': company_name,
+                'logo': logo_url
+            })
+            print(f"  找到公司: {company_name} | Logo: {logo_url.split('/')[-1] if logo_url else 'N/A'}")
+    
+    return companies
+
+def find_last_page(response):
+    """从分页链接中找出最后一页的页码，找不到时返回None"""
+    soup = BeautifulSoup(response.content, 'html.parser')
+    pages = [
+        int(match.group(1))
+        for link in soup.find_all('a', href=True)
+        for match in [re.search(r'[?&]page=(\d+)', link['href'])]
+        if match
+    ]
+    return max(pages) if pages else None
 
 def save_html_for_debug(page_num, content):
     """保存HTML内容用于调试"""
     with open(f'debug_page_{page_num}.html', 'w', encoding='utf-8') as f:
         f.write(content)
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='抓取油气公司市值排名')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'同时抓取的页面数（默认{DEFAULT_CONCURRENCY}）')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'每秒最多请求数（默认{DEFAULT_RATE}）')
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help='最多抓取的页数（默认根据分页链接自动确定）')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='不使用本地HTTP缓存，所有页面都重新下载')
+    return parser.parse_args()
+
 def main():
     """主函数"""
-    all_companies = []
+    args = parse_args()
     
-    # 抓取5个页面的数据
-    for page in range(1, 6):
-        companies = get_page_data(page)
-        all_companies.extend(companies)
-        
-        # 添加延时，避免请求过于频繁
-        if page < 5:
-            time.sleep(2)
+    # 页面内容未变时直接使用本地缓存，便于反复调试解析逻辑
+    cache = None if args.no_cache else HttpCache()
+    
+    # 并发抓取所有页面，总页数从第一页的分页链接中自动确定
+    crawler = PageCrawler(
+        url_for_page=get_page_url,
+        parse_page=lambda response, page: parse_companies(response.content, page),
+        find_last_page=find_last_page,
+        client=HttpClient(pool_maxsize=args.concurrency, cache=cache),
+        rate_limiter=RateLimiter(rate=args.rate),
+        concurrency=args.concurrency,
+        max_pages=args.max_pages
+    )
+    print(f"开始抓取（并发数 {args.concurrency}，每秒最多 {args.rate:g} 个请求）...")
+    all_companies = crawler.run()
+    
+    if crawler.failed_pages:
+        print(f"\n以下页面抓取失败: {sorted(crawler.failed_pages)}")
     
     print(f"\n总共抓取到 {len(all_companies)} 家公司的信息")
     
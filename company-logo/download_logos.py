@@ -6,13 +6,32 @@
 """
 
 import requests
+import argparse
 import json
 import os
-import time
+import sys
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.artifact_store import ArtifactStore
+from utils.http import HttpClient
+from utils.rate_limit import RateLimiter
+
+LOGO_HEADERS = {
+    'Referer': 'https://companiesmarketcap.com/'
+}
+
+# 默认并发下载数
+DEFAULT_WORKERS = 8
+# 默认每个主机每秒最多请求数
+DEFAULT_RATE = 20
+
+# 所有logo共用一个客户端，复用同一主机的连接
+http_client = HttpClient(headers=LOGO_HEADERS)
+
 def sanitize_filename(filename):
     """清理文件名，移除不合法的字符"""
     # 移除或替换不合法的文件名字符
@@ -32,8 +51,17 @@ def get_file_extension(url):
         return os.path.splitext(path)[1].lower()
     return '.png'  # 默认为PNG
 
-def download_logo(company_name, logo_url, output_dir):
-    """下载单个logo"""
+def download_logo(company_name, logo_url, output_dir, client=None, store=None, full_check=False, checked=False):
+    """
+    下载单个logo
+
+    Args:
+        store (ArtifactStore): 记录文件大小和哈希，已有的完整文件跳过，写入时原子替换并去重
+        full_check (bool): 检查已有文件时是否重新计算哈希
+        checked (bool): 调用方已经检查过已有文件、确认需要下载时为True，不再重复检查
+    """
+    client = client or http_client
+    store = store or ArtifactStore(output_dir)
     if not logo_url:
         print(f"  跳过 {company_name}：无logo URL")
         return False
@@ -45,23 +73,13 @@ def download_logo(company_name, logo_url, output_dir):
         filename = f"{safe_name}{file_extension}"
         filepath = os.path.join(output_dir, filename)
         
-        # 如果文件已存在，跳过
-        if os.path.exists(filepath):
+        # 如果文件已存在且完整，跳过
+        if not checked and store.is_valid(filepath, full=full_check):
             print(f"  跳过 {company_name}：文件已存在")
             return True
         
-        # 下载图片
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': 'https://companiesmarketcap.com/'
-        }
-        
-        response = requests.get(logo_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # 保存文件
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
+        # 流式下载到.part文件，完成后由store移动到目标位置，与已有logo内容相同时改为硬链接
+        client.download(logo_url, filepath, commit=store.commit)
         
         print(f"  ✓ 下载成功: {company_name} -> {filename}")
         return True
@@ -73,8 +91,21 @@ def download_logo(company_name, logo_url, output_dir):
         print(f"  ✗ 下载失败 {company_name}: {e}")
         return False
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='批量下载油气公司logo')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'并发下载数，1表示逐个下载（默认{DEFAULT_WORKERS}）')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'每个主机每秒最多请求数（默认{DEFAULT_RATE}）')
+    parser.add_argument('--verify', action='store_true',
+                        help='重新计算已有文件的SHA-256，内容损坏的重新下载（默认只比较大小）')
+    return parser.parse_args()
+
 def main():
     """主函数"""
+    args = parse_args()
+    
     # 读取JSON文件
     json_file = 'oil_gas_companies.json'
     if not os.path.exists(json_file):
@@ -89,21 +120,23 @@ def main():
     # 创建输出目录
     output_dir = 'logo'
     os.makedirs(output_dir, exist_ok=True)
+    # 清单记录每个logo的大小和哈希，被截断或损坏的文件会重新下载
+    store = ArtifactStore(output_dir)
     
     # 统计变量
     success_count = 0
     failed_count = 0
     skipped_count = 0
     
-    print(f"\n开始下载logo到 {output_dir} 目录...")
-    
+    # 先筛掉无需下载的公司，剩下的交给线程池
+    pending = []
+    pending_paths = set()
     for i, company in enumerate(companies, 1):
         company_name = company.get('name', f'Unknown_{i}')
         logo_url = company.get('logo', '')
         
-        print(f"\n[{i:3d}/{len(companies)}] {company_name}")
-        
         if not logo_url:
+            print(f"[{i:3d}/{len(companies)}] {company_name}")
             print(f"  跳过：无logo URL")
             skipped_count += 1
             continue
@@ -114,22 +147,35 @@ def main():
         filename = f"{safe_name}{file_extension}"
         filepath = os.path.join(output_dir, filename)
         
-        if os.path.exists(filepath):
+        # 同名公司只下载一次，与逐个下载时"第二次发现文件已存在"的结果一致
+        if filepath in pending_paths or store.is_valid(filepath, full=args.verify):
+            print(f"[{i:3d}/{len(companies)}] {company_name}")
             print(f"  跳过：文件已存在")
             skipped_count += 1
             continue
         
-        # 下载
-        if download_logo(company_name, logo_url, output_dir):
-            success_count += 1
-        else:
-            failed_count += 1
-        
-        # 添加延时避免请求过于频繁
-        if i % 10 == 0:  # 每10个文件后稍作停顿
-            time.sleep(0.1)
-        else:
-            time.sleep(0.05)
+        pending.append((company_name, logo_url))
+        pending_paths.add(filepath)
+    
+    print(f"\n开始下载logo到 {output_dir} 目录（{len(pending)} 个待下载，并发数 {args.workers}，"
+          f"每个主机每秒最多 {args.rate:g} 个请求）...")
+    
+    # 连接池大小与并发数一致，避免线程等待空闲连接；限速器控制对同一主机的请求频率
+    client = HttpClient(headers=LOGO_HEADERS, pool_maxsize=args.workers,
+                        rate_limiter=RateLimiter(rate=args.rate))
+    
+    with client, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(download_logo, company_name, logo_url, output_dir, client, store, checked=True)
+            for company_name, logo_url in pending
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            if future.result():
+                success_count += 1
+            else:
+                failed_count += 1
+            if done % 50 == 0:
+                print(f"  进度: {done}/{len(pending)}")
     
     # 显示结果统计
     print(f"\n" + "="*50)
@@ -140,7 +186,8 @@ def main():
     print(f"总计处理: {len(companies)} 个")
     
     # 检查输出目录
-    downloaded_files = [f for f in os.listdir(output_dir) if os.path.isfile(os.path.join(output_dir, f))]
+    downloaded_files = [f for f in os.listdir(output_dir)
+                        if os.path.isfile(os.path.join(output_dir, f)) and not f.startswith('.')]
     print(f"\n{output_dir} 目录中共有 {len(downloaded_files)} 个文件")
 
 if __name__ == "__main__":
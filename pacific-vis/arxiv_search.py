@@ -0,0 +1,177 @@
+'''
+arXiv批量查找论文
+把多篇论文的标题合并成一个 ti:"..." OR ti:"..." 查询，已知arXiv id的论文用id_list一次查询，
+再用TitleMatcher把返回的结果对应回各篇论文，每个标题只与它自己的子句可能搜到的结果比较。arXiv要求请求间隔3秒，请求数越少整体越快。
+arXiv: https://arxiv.org/help/api/user-manual#query_details
+'''
+
+import re
+from difflib import SequenceMatcher
+
+import arxiv
+
+
+# 每个查询合并的标题数，太多时查询URL过长
+BATCH_SIZE = 20
+
+# 每个标题检查的结果数，一个查询最多返回 标题数 * TOP_K 条结果
+TOP_K = 5
+
+# 标题相似度达到这个值才认为是同一篇论文，低于它的结果不下载
+MATCH_THRESHOLD = 0.8
+
+# 结果标题至少包含查询标题中这个比例的词，才可能是这个标题的 ti: 子句搜到的；
+# arXiv对词做词干化处理，拼写不同的个别词（如 visualisation / visualization）不要求一致
+CLAUSE_COVERAGE = 0.75
+
+
+def normalize_title(title):
+    """标题转小写，标点替换为空格，合并多余空白"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', title.lower()).split())
+
+
+class TitleMatcher:
+    """
+    论文标题匹配
+    相似度为两种算法的平均值，范围0~1：
+    - 词的Dice系数：标准化后的两个标题共有的词占比，不受词序和标点影响；
+    - 字符序列相似度：容忍个别词的拼写差异，如 visualisation / visualization。
+    只差一个短词或编号的不同标题（如 Part 1 / Part 10）两项得分差距大，平均后达不到阈值。
+    合并查询的结果中混有其他标题搜到的论文，只有包含了该标题大部分词的结果（answers）才参与比较，
+    相似度达到threshold才认为匹配。
+
+    用法：
+        matcher = TitleMatcher(threshold=0.8, top_k=5)
+        result, confidence = matcher.best_match(title, results)
+    """
+
+    def __init__(self, threshold=MATCH_THRESHOLD, top_k=TOP_K):
+        """
+        Args:
+            threshold (float): 最低相似度
+            top_k (int): 每个标题检查的结果数
+        """
+        self.threshold = threshold
+        self.top_k = top_k
+
+    @staticmethod
+    def similarity(title, other):
+        """两个标题的相似度，0~1"""
+        title, other = normalize_title(title), normalize_title(other)
+        if not title or not other:
+            return 0.0
+        words, other_words = set(title.split()), set(other.split())
+        dice = 2 * len(words & other_words) / (len(words) + len(other_words))
+        return (dice + SequenceMatcher(None, title, other).ratio()) / 2
+
+    @staticmethod
+    def coverage(title, other):
+        """title中的词出现在other中的比例，0~1"""
+        words = set(normalize_title(title).split())
+        if not words:
+            return 0.0
+        return len(words & set(normalize_title(other).split())) / len(words)
+
+    def answers(self, title, result):
+        """结果是否可能是这个标题的 ti: 子句搜到的，而不是同一查询中其他标题的结果"""
+        return self.coverage(title, result.title) >= CLAUSE_COVERAGE
+
+    def accepts(self, confidence):
+        """相似度是否足以认为是同一篇论文"""
+        return confidence is not None and confidence >= self.threshold
+
+    def best_match(self, title, results):
+        """
+        从结果中找出与标题最相似的一个
+
+        Returns:
+            tuple: (arxiv.Result, 相似度)，没有结果时返回 (None, None)
+        """
+        best, best_score = None, None
+        for result in results:
+            score = self.similarity(title, result.title)
+            if best_score is None or score > best_score:
+                best, best_score = result, score
+        return best, best_score
+
+
+def build_title_query(titles):
+    """
+    多个标题的OR查询
+    注意，有空格的关键词，必须加上引号(一般通过完整标题搜索，都必须加这个)，标题中的引号去掉
+    """
+    return ' OR '.join('ti:"{}"'.format(title.replace('"', '')) for title in titles)
+
+
+def search_titles(client, titles, matcher=None, claimed=None):
+    """
+    用一个查询查找多篇论文
+    每个标题只与可能是它自己的 ti: 子句搜到的结果比较，相似度从高到低依次分配，
+    同一篇论文只分给一个标题，不会把其他标题的论文当作没有收录在arXiv中的论文的匹配结果
+
+    Args:
+        client (arxiv.Client): 客户端，由它控制两次请求的间隔
+        titles (list): 标题，不超过BATCH_SIZE个
+        matcher (TitleMatcher): 标题匹配，默认使用默认阈值
+        claimed (set): 已经分给其他标题的结果的entry_id，不再参与匹配，匹配成功的结果会加入其中
+
+    Returns:
+        dict: {标题: (最相似的arxiv.Result, 相似度)}，没有可能的结果时为 (None, None)；
+              相似度是否足够由matcher.accepts判断
+
+    Raises:
+        请求出错时抛出异常，调用方不应把这些标题记为没有搜索到
+    """
+    matcher = matcher or TitleMatcher()
+    claimed = set() if claimed is None else claimed
+    max_results = len(titles) * matcher.top_k
+    search = arxiv.Search(query=build_title_query(titles), max_results=max_results)
+    results = list(client.results(search))
+
+    candidates = {title: [result for result in results if matcher.answers(title, result)] for title in titles}
+    scored = sorted(
+        ((matcher.similarity(title, result.title), index, title, result)
+         for index, title in enumerate(titles) for result in candidates[title]),
+        key=lambda item: (-item[0], item[1])
+    )
+    papers = {}
+    for score, _, title, result in scored:
+        if title in papers or result.entry_id in claimed or not matcher.accepts(score):
+            continue
+        papers[title] = (result, score)
+        claimed.add(result.entry_id)
+
+    for title in titles:
+        if title in papers:
+            continue
+        if len(results) >= max_results and len(titles) > 1:
+            # 结果数达到上限，可能被其他标题的结果挤掉了，单独再查一次
+            papers[title] = search_titles(client, [title], matcher, claimed)[title]
+        else:
+            # 没有达到阈值时只保留可能是它自己搜到、没有分给其他标题的最相似结果
+            papers[title] = matcher.best_match(
+                title, [result for result in candidates[title] if result.entry_id not in claimed])
+    return {title: papers[title] for title in titles}
+
+
+def lookup_ids(client, arxiv_ids):
+    """
+    按arXiv id查询论文
+
+    Returns:
+        dict: {arxiv_id: arxiv.Result}，没有查到的id不在其中
+    """
+    search = arxiv.Search(id_list=list(arxiv_ids), max_results=len(arxiv_ids))
+    papers = {}
+    for result in client.results(search):
+        short_id = result.get_short_id()
+        papers[short_id] = result
+        # 记录中可能是不带版本号的id
+        papers[short_id.rsplit('v', 1)[0]] = result
+    return papers
+
+
+def chunked(items, size=BATCH_SIZE):
+    """把列表按size个一组切分"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
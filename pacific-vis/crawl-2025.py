@@ -1,13 +1,21 @@
-import requests
 from bs4 import BeautifulSoup
 import json
 import re
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.http import HttpClient
+from utils.http_cache import HttpCache
+
+# 页面未变时直接使用本地缓存
+http_client = HttpClient(cache=HttpCache())
 
 def crawl_pacific_vis_2025():
     url = "https://pacificvis2025.github.io/pages/TechnicalSessions.html"
     
     # 发送HTTP请求
-    response = requests.get(url)
+    response = http_client.get(url)
     if response.status_code != 200:
         print(f"请求失败，状态码: {response.status_code}")
         return None
@@ -2,9 +2,17 @@
 抓取PacificVis 2024网站上的论文列表，并将结果保存为JSON文件，便于批量下载
 """
 import json
-import requests
+import sys
+from pathlib import Path
 from bs4 import BeautifulSoup
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.http import HttpClient
+from utils.http_cache import HttpCache
+
+# 各类型页面都在同一站点，共用一个客户端复用连接；页面未变时直接使用本地缓存
+http_client = HttpClient(timeout=5, cache=HttpCache())
+
 type_urls = {
     'TVCG Papers': 'https://pacificvis.github.io/pvis2024/papers/jrnl/',
     #   'Conference papers': 'https://pacificvis.github.io/pvis2024/papers/conf/',
@@ -17,7 +25,7 @@ type_urls = {
 def get_papers(url):
     """获取指定网页上的论文列表"""
     # 1. 抓取网页内容
-    response = requests.get(url, timeout=5)  # Add timeout argument
+    response = http_client.get(url)
     html_content = response.content
 
     # 2. 解析HTML并输出id="page-title"元素的innerHTML
@@ -4,9 +4,125 @@ arXiv: https://arxiv.org/help/api/user-manual#query_details
 github：https://github.com/lukasschwab/arxiv.py
 '''
 
+import argparse
 import json
 import arxiv
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.artifact_store import ArtifactStore
+from utils.http import DownloadProgress, HttpClient
+from arxiv_search import BATCH_SIZE, MATCH_THRESHOLD, TOP_K, TitleMatcher, chunked, lookup_ids, search_titles
+
+
+# 论文保存目录
+SAVE_DIR = "./arxiv/papers/2025"
+
+# 下载记录，每处理完一篇论文追加一行，重新运行时跳过已完成的论文
+JOURNAL_PATH = os.path.join(SAVE_DIR, "download_journal.jsonl")
+
+# arXiv API要求两次请求之间至少间隔3秒
+SEARCH_DELAY = 3
+
+# 同时下载PDF的线程数
+DOWNLOAD_WORKERS = 4
+
+# 打印PDF下载进度的间隔（秒）
+PROGRESS_INTERVAL = 5
+
+# 没有传入客户端时下载PDF共用的HTTP客户端，所有论文共用同一个连接池
+shared_http_client = HttpClient(pool_maxsize=DOWNLOAD_WORKERS)
+
+
+class DownloadJournal:
+    """
+    论文下载记录（JSON Lines）
+    每处理完一篇论文追加一行 {"title", "status", "arxiv_id", "path", "confidence", "time"}，同一标题以最后一行为准。
+    confidence为搜索结果与标题的相似度。
+    只追加不改写，中途中断最多丢失最后一行。多个下载线程可以共用同一个实例。
+
+    状态：
+        downloaded: 已下载，文件还在时跳过
+        not_found: arXiv中没有搜索到，默认跳过，retry_not_found为True时重新搜索
+        low_confidence: 搜索结果与标题的相似度低于阈值，没有下载，arxiv_id为最相似的结果，跳过规则同not_found
+        failed: 搜索到了但下载失败，重新运行时按记录的arxiv_id直接查询，不再按标题搜索
+    """
+    DOWNLOADED = 'downloaded'
+    NOT_FOUND = 'not_found'
+    LOW_CONFIDENCE = 'low_confidence'
+    FAILED = 'failed'
+
+    def __init__(self, path=JOURNAL_PATH, retry_not_found=False):
+        """
+        Args:
+            path (str): 记录文件路径
+            retry_not_found (bool): 是否重新搜索上次没有搜索到或相似度过低的论文
+        """
+        self.path = path
+        self.retry_not_found = retry_not_found
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def normalize_title(title):
+        """标题忽略大小写和多余空白"""
+        return ' '.join(title.lower().split())
+
+    def load(self):
+        """读取已有记录"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时可能留下不完整的最后一行
+                    print(f"忽略下载记录中无法解析的第{line_no}行")
+                    continue
+                self.entries[self.normalize_title(entry['title'])] = entry
+        print(f"已加载 {len(self.entries)} 条下载记录")
+
+    def get(self, title):
+        """某篇论文最近一次的记录，没有时返回None"""
+        return self.entries.get(self.normalize_title(title))
+
+    def is_done(self, title):
+        """是否不需要再处理"""
+        entry = self.get(title)
+        if not entry:
+            return False
+        if entry['status'] == self.DOWNLOADED:
+            return bool(entry.get('path')) and os.path.exists(entry['path'])
+        if entry['status'] in (self.NOT_FOUND, self.LOW_CONFIDENCE):
+            return not self.retry_not_found
+        return False
+
+    def record(self, title, status, arxiv_id=None, path=None, confidence=None):
+        """追加一条记录"""
+        entry = {
+            'title': title,
+            'status': status,
+            'arxiv_id': arxiv_id,
+            'path': path,
+            'confidence': round(confidence, 3) if confidence is not None else None,
+            'time': datetime.now().isoformat(timespec='seconds')
+        }
+        with self.lock:
+            self.entries[self.normalize_title(title)] = entry
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return entry
 
 
 def sanitize_filename(text, max_length=50):
@@ -27,87 +143,299 @@ def sanitize_filename(text, max_length=50):
     return text
 
 
-def download(raw_title, paper_type=None, category=None):
-    """下载论文"""
-    client = arxiv.Client()
+def get_filename(raw_title, paper_type=None, category=None):
+    """根据标题、类型和分类生成有效的文件名"""
+    valid_title = sanitize_filename(raw_title)
+    if category and paper_type:
+        valid_category = sanitize_filename(category, 30)
+        return f"{valid_category}-{paper_type}-{valid_title}.pdf"
+    return f"{valid_title}.pdf"
 
-    # 注意，有空格的关键词，必须加上引号和转义符(一般通过完整标题搜索，都必须加这个)
-    escaped_title = "\"{}\"".format(raw_title)
-    search = arxiv.Search(query=f"ti:{escaped_title}")
 
-    try:
-        paper = next(client.results(search))
-        print(paper)
-        
-        # 清理标题、类型和分类，生成有效的文件名
-        valid_title = sanitize_filename(raw_title)
-        
-        # 构建文件名
-        if category and paper_type:
-            valid_category = sanitize_filename(category, 30)
-            filename = f"{valid_category}-{paper_type}-{valid_title}.pdf"
+def is_complete_pdf(path):
+    """PDF以%PDF-开头、以%%EOF结尾，下载中断的文件通常缺少结尾"""
+    with open(path, 'rb') as f:
+        if f.read(5) != b'%PDF-':
+            return False
+        f.seek(max(os.path.getsize(path) - 2048, 0))
+        return b'%%EOF' in f.read()
+
+
+def create_store():
+    """论文目录的文件存储，记录每个PDF的大小和SHA-256"""
+    return ArtifactStore(SAVE_DIR, validate=is_complete_pdf)
+
+
+def check_journal(raw_title, path, journal=None, store=None, full_check=False):
+    """
+    根据下载记录判断论文是否还需要处理
+
+    Args:
+        store (ArtifactStore): 文件存储，已下载的论文还要检查文件是否完整
+        full_check (bool): 检查文件时是否重新计算SHA-256
+
+    Returns:
+        bool or None: 不需要处理时返回论文是否已下载，需要处理时返回None
+    """
+    if not journal:
+        return None
+    store = store or create_store()
+    entry = journal.get(raw_title)
+    if journal.is_done(raw_title):
+        if entry['status'] == DownloadJournal.DOWNLOADED and not store.is_valid(entry['path'], full=full_check):
+            print(f"文件不完整，重新下载: {entry['path']}")
+            return None
+        print(f"已处理过（{entry['status']}），跳过: {raw_title}")
+        return entry['status'] == DownloadJournal.DOWNLOADED
+    if not entry and store.is_valid(path):
+        # 没有下载记录之前已经下载过的论文
+        journal.record(raw_title, DownloadJournal.DOWNLOADED, path=path)
+        print(f"文件已存在，跳过: {path}")
+        return True
+    return None
+
+
+def search_papers(arxiv_client, raw_titles, journal=None, matcher=None):
+    """
+    在arXiv中查找一批论文，标题合并成一个查询，上次已找到但下载失败的论文按记录的arxiv_id一次查询
+
+    Args:
+        arxiv_client (arxiv.Client): 搜索用的客户端，由它控制两次请求的间隔
+        raw_titles (list): 论文标题，不超过arxiv_search.BATCH_SIZE篇
+        journal (DownloadJournal): 下载记录
+        matcher (TitleMatcher): 标题匹配，相似度低于阈值的结果不下载
+
+    Returns:
+        dict: {标题: (arxiv.Result, 相似度)}，没有搜索到或相似度过低时arxiv.Result为None；
+              搜索出错的标题不在其中，下次重新搜索
+    """
+    matcher = matcher or TitleMatcher()
+    known_ids = {}
+    titles = []
+    for raw_title in raw_titles:
+        entry = journal.get(raw_title) if journal else None
+        # 下载失败或文件损坏的论文已经知道arxiv_id
+        if entry and entry['status'] in (DownloadJournal.FAILED, DownloadJournal.DOWNLOADED) and entry.get('arxiv_id'):
+            known_ids[raw_title] = entry
         else:
-            filename = f"{valid_title}.pdf"
-        
+            titles.append(raw_title)
+
+    papers = {}
+    if known_ids:
         try:
-            paper.download_pdf(dirpath="./arxiv/papers/2025", filename=filename)
-            return True
-        except arxiv.DownloadFailed:
-            print(f"下载失败： {raw_title}")
-            return False
-    except StopIteration:
-        print(f"没有搜索到结果: {raw_title}")
-        return False
+            found = lookup_ids(arxiv_client, [entry['arxiv_id'] for entry in known_ids.values()])
+            for raw_title, entry in known_ids.items():
+                papers[raw_title] = (found.get(entry['arxiv_id']), entry.get('confidence'))
+                if papers[raw_title][0] is None:
+                    print(f"按id {entry['arxiv_id']} 没有查到: {raw_title}")
+        except Exception as e:
+            print(f"按id查询时出错: {e}")
+    if titles:
+        try:
+            results = search_titles(arxiv_client, titles, matcher)
+        except Exception as e:
+            print(f"搜索时出错: {e}")
+            results = {}
+        for raw_title, (paper, confidence) in results.items():
+            if paper is not None and not matcher.accepts(confidence):
+                print(f"相似度过低（{confidence:.2f}），不下载: {raw_title}\n    最相似的结果: {paper.title}")
+                if journal:
+                    journal.record(raw_title, DownloadJournal.LOW_CONFIDENCE,
+                                   arxiv_id=paper.get_short_id(), confidence=confidence)
+                paper = None
+            elif paper is None:
+                print(f"没有搜索到结果: {raw_title}")
+                if journal:
+                    journal.record(raw_title, DownloadJournal.NOT_FOUND)
+            else:
+                print(f"{paper}（相似度 {confidence:.2f}）")
+            papers[raw_title] = (paper, confidence)
+    return papers
+
+
+def search_paper(arxiv_client, raw_title, journal=None, matcher=None):
+    """
+    在arXiv中查找一篇论文
+
+    Returns:
+        tuple: (arxiv.Result, 相似度)，没有搜索到、相似度过低或搜索出错时arxiv.Result为None
+    """
+    return search_papers(arxiv_client, [raw_title], journal, matcher).get(raw_title, (None, None))
+
+
+def download_paper(paper, raw_title, filename, journal=None, confidence=None, store=None, http_client=None):
+    """
+    下载已找到的论文的PDF
+    流式写入.part文件，中断后再次下载时从断点继续；确认是完整的PDF后再移动到目标位置，
+    与已有PDF内容相同时改为硬链接
+
+    Args:
+        http_client (HttpClient): 下载PDF用的客户端，多个线程可以共用，默认使用shared_http_client
+
+    Returns:
+        bool: 是否下载成功
+    """
+    store = store or create_store()
+    http_client = http_client or shared_http_client
+    arxiv_id = paper.get_short_id()
+    path = os.path.join(SAVE_DIR, filename)
+
+    def commit_pdf(part_path, path):
+        if not is_complete_pdf(part_path):
+            os.remove(part_path)
+            raise ValueError("下载的文件不是完整的PDF")
+        store.commit(part_path, path)
+
+    try:
+        http_client.download(paper.pdf_url, path, progress=DownloadProgress(filename, PROGRESS_INTERVAL),
+                             commit=commit_pdf)
     except Exception as e:
-        print(f"下载时出错: {e}")
+        print(f"下载失败： {raw_title}，{e}")
+        if journal:
+            journal.record(raw_title, DownloadJournal.FAILED, arxiv_id=arxiv_id, confidence=confidence)
         return False
 
+    print(f"下载完成: {raw_title}")
+    if journal:
+        journal.record(raw_title, DownloadJournal.DOWNLOADED, arxiv_id=arxiv_id, path=path, confidence=confidence)
+    return True
+
 
-def parse_map(file):
+def download(raw_title, paper_type=None, category=None, journal=None, arxiv_client=None, matcher=None, store=None,
+             http_client=None):
+    """
+    下载论文，搜索和下载依次进行；批量下载请使用DownloadPipeline
+
+    Args:
+        raw_title (str): 论文标题
+        paper_type (str): 论文类型
+        category (str): 论文分类
+        journal (DownloadJournal): 下载记录，已完成的论文直接跳过，不再请求arXiv
+        arxiv_client (arxiv.Client): 搜索用的客户端，多次调用时应传入同一个
+        matcher (TitleMatcher): 标题匹配，相似度低于阈值的结果不下载
+        store (ArtifactStore): 文件存储，多次调用时应传入同一个
+        http_client (HttpClient): 下载PDF用的客户端，默认所有论文共用shared_http_client
+
+    Returns:
+        bool: 论文是否已下载
+    """
+    store = store or create_store()
+    filename = get_filename(raw_title, paper_type, category)
+    done = check_journal(raw_title, os.path.join(SAVE_DIR, filename), journal, store)
+    if done is not None:
+        return done
+
+    arxiv_client = arxiv_client or arxiv.Client(delay_seconds=SEARCH_DELAY)
+    paper, confidence = search_paper(arxiv_client, raw_title, journal, matcher)
+    if paper is None:
+        return False
+    return download_paper(paper, raw_title, filename, journal, confidence, store, http_client)
+
+
+class DownloadPipeline:
+    """
+    搜索和下载两阶段流水线
+    搜索阶段在当前线程中按顺序进行，每batch_size篇论文合并成一个查询，
+    所有搜索共用一个arxiv.Client，由它保证两次请求至少间隔SEARCH_DELAY秒；
+    与标题足够相似的结果交给下载线程池并发下载PDF，下载与后面论文的搜索同时进行，
+    总耗时接近只搜索所需的时间。
+
+    用法：
+        pipeline = DownloadPipeline(journal)
+        success_count = pipeline.run([(标题, 类型, 分类), ...])
+    """
+
+    def __init__(self, journal=None, workers=DOWNLOAD_WORKERS, delay_seconds=SEARCH_DELAY, batch_size=BATCH_SIZE,
+                 matcher=None, full_check=False):
+        """
+        Args:
+            journal (DownloadJournal): 下载记录
+            workers (int): 同时下载PDF的线程数
+            delay_seconds (float): 两次搜索请求的最小间隔（秒）
+            batch_size (int): 每个查询合并的论文数，为1时逐篇搜索
+            matcher (TitleMatcher): 标题匹配，默认使用默认的阈值和top_k
+            full_check (bool): 检查已下载的PDF时是否重新计算SHA-256，默认只比较大小
+        """
+        self.journal = journal or DownloadJournal()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.matcher = matcher or TitleMatcher()
+        self.full_check = full_check
+        # 下载PDF的连接池与下载线程数一致
+        self.http_client = HttpClient(pool_maxsize=workers)
+        self.arxiv_client = arxiv.Client(delay_seconds=delay_seconds)
+
+    def run(self, papers):
+        """
+        搜索并下载论文
+
+        Args:
+            papers (list): [(标题, 类型, 分类), ...]，类型和分类可以为None
+
+        Returns:
+            int: 已下载（包括之前下载过）的论文数
+        """
+        store = create_store()
+        success_count = 0
+        # {标题: 文件名}，同名的论文只下载一次
+        pending = {}
+        for raw_title, paper_type, category in papers:
+            filename = get_filename(raw_title, paper_type, category)
+            done = check_journal(raw_title, os.path.join(SAVE_DIR, filename), self.journal, store, self.full_check)
+            if done is None:
+                pending.setdefault(raw_title, filename)
+            else:
+                success_count += done
+        print(f"共{len(papers)}篇论文，需要搜索{len(pending)}篇，每次查询{self.batch_size}篇")
+
+        futures = []
+        searched = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch in chunked(list(pending), self.batch_size):
+                searched += len(batch)
+                print(f"[搜索 {searched}/{len(pending)}]")
+                papers = search_papers(self.arxiv_client, batch, self.journal, self.matcher)
+                for raw_title, (paper, confidence) in papers.items():
+                    if paper is not None:
+                        futures.append(executor.submit(
+                            download_paper, paper, raw_title, pending[raw_title], self.journal, confidence, store,
+                            self.http_client))
+            success_count += sum(future.result() for future in futures)
+        return success_count
+
+
+def parse_map(file, pipeline=None):
     """解析不同类型的论文"""
-    count = 0
     with open(file, 'r', encoding='utf-8') as file:
         data = json.load(file)
 
+    papers = []
     for key, value in data.items():
-        print(f"开始下载分类: {key}, {value}")
         if isinstance(value, list):
-            for idx, item in enumerate(value):
-                print(f"    Item {idx}: {item}")
-                download(item)
-                count += 1
-                print(f"已下载【{count}】篇论文")
+            print(f"分类: {key}，共{len(value)}篇论文")
+            papers.extend((item, None, None) for item in value)
         else:
             print(f"无效的list: {value}")
-    print(f"下载完成，共下载【{count}】篇论文")
 
+    success_count = (pipeline or DownloadPipeline()).run(papers)
+    print(f"下载完成，共处理【{len(papers)}】篇论文，成功下载【{success_count}】篇")
 
-def parse_list(file):
+
+def parse_list(file, pipeline=None):
     """解析返回的paper列表"""
-    count = 0
     with open(file, 'r', encoding='utf-8') as file:
         data = json.load(file)
 
     if isinstance(data, list):
-        for idx, item in enumerate(data):
-            print(f"    Item {idx}: {item}")
-            download(item)
-            count += 1
-            print(f"已下载【{count}】篇论文")
-        print(f"下载完成，共下载【{count}】篇论文")
+        papers = [(item, None, None) for item in data]
+        success_count = (pipeline or DownloadPipeline()).run(papers)
+        print(f"下载完成，共处理【{len(papers)}】篇论文，成功下载【{success_count}】篇")
     else:
         print(f"无效的list: {data}")
 
 
-def parse_pvis_2025(file):
+def parse_pvis_2025(file, pipeline=None):
     """解析PacificVis 2025论文数据"""
-    count = 0
-    success_count = 0
-    
-    # 确保保存目录存在
-    save_dir = "./arxiv/papers/2025"
-    os.makedirs(save_dir, exist_ok=True)
-    
     with open(file, 'r', encoding='utf-8') as f:
         papers = json.load(f)
     
@@ -119,32 +447,40 @@ def parse_pvis_2025(file):
             papers_by_category[category] = []
         papers_by_category[category].append(paper)
     
-    # 逐个下载论文
+    # 按分类顺序搜索，搜到的论文并发下载
+    tasks = []
     for category, category_papers in papers_by_category.items():
-        print(f"\n开始下载分类: {category}，共{len(category_papers)}篇论文")
-        
-        for idx, paper in enumerate(category_papers):
-            title = paper['title']
-            paper_type = paper['type']
-            
-            print(f"    [{idx+1}/{len(category_papers)}] [{paper_type}] {title}")
-            try:
-                success = download(title, paper_type, category)
-                if success:
-                    success_count += 1
-            except Exception as e:
-                print(f"    下载出错: {e}")
-            
-            count += 1
-            print(f"处理进度: {count}/{len(papers)}，成功下载: {success_count}")
-    
-    print(f"\n下载完成，共处理{count}篇论文，成功下载{success_count}篇")
+        print(f"分类: {category}，共{len(category_papers)}篇论文")
+        tasks.extend((paper['title'], paper['type'], category) for paper in category_papers)
+
+    success_count = (pipeline or DownloadPipeline()).run(tasks)
+    print(f"\n下载完成，共处理{len(tasks)}篇论文，成功下载{success_count}篇")
 
 
 def main():
     """主流程"""
+    parser = argparse.ArgumentParser(description='从arXiv下载论文，已下载的论文记录在下载记录中，重新运行时跳过')
+    parser.add_argument('file', nargs='?', default='PVIS-2025-Technical-Sessions.json',
+                        help='论文数据文件（默认PVIS-2025-Technical-Sessions.json）')
+    parser.add_argument('--retry-not-found', action='store_true', help='重新搜索上次没有搜索到或相似度过低的论文')
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS,
+                        help=f'同时下载PDF的线程数（默认{DOWNLOAD_WORKERS}）')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f'每个arXiv查询合并的论文数（默认{BATCH_SIZE}）')
+    parser.add_argument('--threshold', type=float, default=MATCH_THRESHOLD,
+                        help=f'搜索结果与标题的最低相似度，0~1（默认{MATCH_THRESHOLD}）')
+    parser.add_argument('--top-k', type=int, default=TOP_K,
+                        help=f'每篇论文检查的搜索结果数（默认{TOP_K}）')
+    parser.add_argument('--verify', action='store_true',
+                        help='重新计算已下载PDF的SHA-256，内容损坏的重新下载（默认只比较大小）')
+    args = parser.parse_args()
+
+    journal = DownloadJournal(retry_not_found=args.retry_not_found)
+    matcher = TitleMatcher(threshold=args.threshold, top_k=args.top_k)
+    pipeline = DownloadPipeline(journal, workers=args.workers, batch_size=args.batch_size, matcher=matcher,
+                                full_check=args.verify)
     # 使用新的解析函数处理PacificVis 2025论文数据
-    parse_pvis_2025('PVIS-2025-Technical-Sessions.json')
+    parse_pvis_2025(args.file, pipeline)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,228 @@
+"""下载文件的完整性校验与去重存储"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def get_file_mode():
+    """普通方式新建文件时的权限，mkstemp创建的临时文件只有所有者可读写"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class ArtifactStore:
+    """
+    下载文件的本地存储
+    - 文件先写入同目录下的临时文件，完成后原子重命名，中断时不会留下不完整的目标文件；
+    - 清单记录每个文件的大小和SHA-256，据此判断已有文件是否完整，被截断或损坏的文件会被重新下载；
+    - 内容相同的文件用硬链接共享同一份数据，文件系统不支持硬链接时保留独立的副本。
+
+    清单为root目录下的JSON Lines文件，每写入一个文件追加一行，同一路径以最后一行为准。
+    清单中没有记录的已有文件（如使用存储之前下载的）在第一次检查时计算哈希并加入清单，
+    传入validate时先用它检查文件内容。线程间可以共享同一个实例。
+
+    注意：硬链接的文件共享数据，不要直接修改存储中的文件，需要修改时通过write写入新内容。
+
+    用法：
+        store = ArtifactStore('logo')
+        if not store.is_valid(path):
+            store.write(path, data)
+    """
+    MANIFEST_NAME = '.artifacts.jsonl'
+    # 计算哈希时每次读取的字节数
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, root, validate=None):
+        """
+        Args:
+            root (str): 存储目录，清单中的路径相对于它
+            validate (callable): 检查清单中没有记录的已有文件，参数为文件路径，返回是否完整
+        """
+        self.root = root
+        self.validate = validate
+        self.manifest_path = os.path.join(root, self.MANIFEST_NAME)
+        self.file_mode = get_file_mode()
+        self.lock = threading.Lock()
+        # {相对路径: {'path', 'size', 'sha256', 'time'}}
+        self.entries = {}
+        # {SHA-256: 相对路径}，用于查找内容相同的文件
+        self.by_hash = {}
+        os.makedirs(root, exist_ok=True)
+        self.load()
+
+    def key(self, path):
+        """文件在清单中的键：相对于root的路径"""
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def full_path(self, key):
+        """清单中的键对应的文件路径"""
+        return os.path.join(self.root, *key.split('/'))
+
+    def load(self):
+        """读取清单，有被覆盖的旧记录时重写清单"""
+        if not os.path.exists(self.manifest_path):
+            return
+        line_count = 0
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                line_count += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时可能留下不完整的最后一行
+                    continue
+                self.entries[entry['path']] = entry
+        for key, entry in self.entries.items():
+            self.by_hash.setdefault(entry['sha256'], key)
+        if line_count > len(self.entries):
+            self.compact()
+
+    def compact(self):
+        """只保留每个路径最新的记录，先写临时文件再替换，保持普通文件的权限"""
+        with self.lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=self.MANIFEST_NAME, suffix='.tmp')
+            os.chmod(tmp_path, self.file_mode)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.manifest_path)
+
+    def record(self, key, size, sha256):
+        """追加一条记录"""
+        entry = {'path': key, 'size': size, 'sha256': sha256, 'time': int(time.time())}
+        with self.lock:
+            previous = self.entries.get(key)
+            # 文件内容变了，旧内容不能再通过它去重
+            if previous and self.by_hash.get(previous['sha256']) == key:
+                del self.by_hash[previous['sha256']]
+            self.entries[key] = entry
+            self.by_hash[sha256] = key
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return entry
+
+    def hash_file(self, path):
+        """分块计算文件的SHA-256"""
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def is_valid(self, path, full=False):
+        """
+        文件是否存在且完整
+
+        Args:
+            path (str): 文件路径
+            full (bool): 是否重新计算SHA-256校验内容，默认只比较大小
+
+        Returns:
+            bool: 不完整时返回False，调用方应重新下载
+        """
+        if not os.path.isfile(path):
+            return False
+        entry = self.entries.get(self.key(path))
+        if entry is None:
+            return self.adopt(path)
+        if os.path.getsize(path) != entry['size']:
+            return False
+        return not full or self.hash_file(path) == entry['sha256']
+
+    def adopt(self, path):
+        """把清单中没有记录的已有文件加入清单，内容与已有文件相同时替换为硬链接"""
+        if self.validate and not self.validate(path):
+            return False
+        sha256 = self.hash_file(path)
+        self.link_duplicate(path, sha256)
+        self.record(self.key(path), os.path.getsize(path), sha256)
+        return True
+
+    def temp_path(self, path):
+        """与目标文件同目录的临时文件路径，重命名时是原子操作"""
+        directory, name = os.path.split(path)
+        os.makedirs(directory or '.', exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix=f'.{name}.', suffix='.tmp')
+        os.close(fd)
+        os.chmod(tmp_path, self.file_mode)
+        return tmp_path
+
+    def write(self, path, data):
+        """
+        写入文件
+
+        Args:
+            path (str): 目标路径
+            data (bytes): 文件内容
+
+        Returns:
+            str: 文件的SHA-256
+        """
+        tmp_path = self.temp_path(path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            return self.commit(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def commit(self, tmp_path, path):
+        """
+        把已经完整写好的临时文件移动到目标路径并记录到清单，内容与已有文件相同时改为硬链接
+
+        Args:
+            tmp_path (str): 临时文件，必须与目标在同一文件系统
+            path (str): 目标路径
+
+        Returns:
+            str: 文件的SHA-256
+        """
+        sha256 = self.hash_file(tmp_path)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        self.link_duplicate(path, sha256)
+        self.record(self.key(path), size, sha256)
+        return sha256
+
+    def link_duplicate(self, path, sha256):
+        """
+        已有内容相同的完整文件时，把path替换为指向它的硬链接
+        已有文件的SHA-256与清单一致时才链接，不会把新文件换成已损坏的数据
+
+        Returns:
+            bool: 是否替换成了硬链接
+        """
+        with self.lock:
+            existing_key = self.by_hash.get(sha256)
+        if existing_key is None or existing_key == self.key(path):
+            return False
+        existing = self.full_path(existing_key)
+        entry = self.entries.get(existing_key)
+        if not entry or not os.path.isfile(existing) or os.path.getsize(existing) != entry['size']:
+            return False
+        if os.path.samefile(existing, path):
+            return True
+        # 大小相同但内容可能已经损坏，链接前重新计算哈希确认
+        if self.hash_file(existing) != entry['sha256']:
+            return False
+
+        tmp_path = self.temp_path(path)
+        os.remove(tmp_path)
+        try:
+            os.link(existing, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            # 不支持硬链接（如跨文件系统），保留独立的副本
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
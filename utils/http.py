@@ -0,0 +1,353 @@
+"""带连接池的HTTP客户端"""
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpClient:
+    """
+    共享的HTTP客户端
+    基于requests.Session实现keep-alive连接池，同一主机的请求会复用已建立的TCP/TLS连接，
+    避免每个请求都重新握手。线程间可以共享同一个实例。
+
+    用法：
+        client = HttpClient(headers={'Referer': 'https://example.com/'})
+        response = client.get(url, params=params)
+    """
+    DEFAULT_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    DEFAULT_TIMEOUT = 10
+    # 连接池中最多缓存多少个主机的连接
+    POOL_CONNECTIONS = 10
+    # 每个主机最多同时保持的连接数，超过后请求会排队等待空闲连接
+    POOL_MAXSIZE = 10
+    # 遇到限流、服务暂不可用或连接错误时的最大重试次数
+    MAX_RETRIES = 3
+    # 指数退避的基础等待时间（秒），第n次重试等待约 BACKOFF_FACTOR * 2^n 秒
+    BACKOFF_FACTOR = 1
+    # 单次退避的最长等待时间（秒）
+    MAX_BACKOFF = 60
+    # 需要重试的状态码
+    RETRY_STATUSES = (429, 502, 503, 504)
+    # 表示服务端要求降速的状态码，会同时降低该主机的请求速率
+    THROTTLE_STATUSES = (429, 503)
+    # 流式下载时每次写入文件的字节数
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, headers=None, timeout=None, pool_connections=None, pool_maxsize=None, proxies=None,
+                 rate_limiter=None, max_retries=None, cache=None):
+        """
+        Args:
+            headers (dict): 默认请求头，会覆盖DEFAULT_HEADERS中的同名项
+            timeout (float): 默认超时时间（秒）
+            pool_connections (int): 缓存连接的主机数量
+            pool_maxsize (int): 每个主机的最大连接数
+            proxies (dict): 代理设置，格式同requests，如 {'https': 'http://127.0.0.1:10809'}
+            rate_limiter (RateLimiter): 按主机限速，每个请求发送前先拿令牌，不传则不限速
+            max_retries (int): 最大重试次数，0表示不重试
+            cache (HttpCache): 响应缓存，GET请求优先读缓存，过期后发送条件请求，不传则不缓存
+        """
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+        self.rate_limiter = rate_limiter
+        self.max_retries = self.MAX_RETRIES if max_retries is None else max_retries
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(self.DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+        if proxies:
+            self.session.proxies.update(proxies)
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections or self.POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or self.POOL_MAXSIZE,
+            pool_block=True
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, rate_limiter=None, acquired=False, **kwargs):
+        """
+        发送请求，参数同requests.Session.request，未指定timeout时使用默认超时
+
+        设置了cache时，非流式的GET请求先查缓存：有效期内直接返回缓存的响应（带from_cache=True属性）；
+        过期的带上If-None-Match/If-Modified-Since重新验证，服务端返回304时仍使用缓存内容。
+
+        Args:
+            rate_limiter (RateLimiter): 本次请求使用的限速器，默认使用客户端自己的
+            acquired (bool): 调用方已经为首次请求拿过令牌（比如在协程中异步等待过），首次请求不再等待
+        """
+        if not self.use_cache(method, kwargs):
+            return self.send(method, url, rate_limiter, acquired, **kwargs)
+
+        full_url = self.build_url(url, kwargs.get('params'))
+        request_headers = self.merge_headers(kwargs.get('headers'))
+        entry = self.cache.lookup(method, full_url, request_headers)
+        if entry and entry.is_fresh(self.cache.ttl):
+            return entry.to_response()
+
+        if entry:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **entry.conditional_headers()}
+        response = self.send(method, url, rate_limiter, acquired, **kwargs)
+        if entry and response.status_code == 304:
+            self.cache.refresh(entry, response)
+            return entry.to_response()
+        self.cache.store(method, full_url, request_headers, response)
+        return response
+
+    def has_fresh_cache(self, url, params=None, headers=None):
+        """GET请求是否能直接从缓存返回，可用于跳过限速等待"""
+        if not self.cache:
+            return False
+        entry = self.cache.lookup('GET', self.build_url(url, params), self.merge_headers(headers))
+        return entry is not None and entry.is_fresh(self.cache.ttl)
+
+    def use_cache(self, method, kwargs):
+        """只有普通的GET请求走缓存，流式下载不缓存"""
+        return self.cache is not None and method.upper() == 'GET' and not kwargs.get('stream')
+
+    @staticmethod
+    def build_url(url, params=None):
+        """拼接查询参数，得到实际请求的URL"""
+        return requests.Request('GET', url, params=params).prepare().url
+
+    def merge_headers(self, headers=None):
+        """合并默认请求头和本次请求头"""
+        return {**self.session.headers, **(headers or {})}
+
+    def send(self, method, url, rate_limiter=None, acquired=False, **kwargs):
+        """
+        发送请求（不经过缓存）
+
+        遇到RETRY_STATUSES中的状态码或连接错误时按指数退避（带随机抖动）重试，
+        服务端给出Retry-After时按它等待；429/503还会通知限速器降低该主机的速率。
+        重试用尽后返回最后一次的响应，连接错误则抛出异常。
+
+        Args:
+            rate_limiter (RateLimiter): 本次请求使用的限速器，默认使用客户端自己的
+            acquired (bool): 调用方已经为首次请求拿过令牌（比如在协程中异步等待过），首次请求不再等待
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        rate_limiter = rate_limiter or self.rate_limiter
+
+        for attempt in range(self.max_retries + 1):
+            if rate_limiter and not (acquired and attempt == 0):
+                rate_limiter.acquire(url)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.get_backoff(attempt))
+                continue
+
+            if response.status_code not in self.RETRY_STATUSES or attempt == self.max_retries:
+                if rate_limiter and response.ok:
+                    rate_limiter.record_success(url)
+                return response
+
+            delay = self.get_retry_after(response)
+            if delay is None:
+                delay = self.get_backoff(attempt)
+            response.close()
+            if rate_limiter and response.status_code in self.THROTTLE_STATUSES:
+                # 由限速器暂停该主机，其他线程的请求也会一起等待
+                rate_limiter.backoff(url, delay)
+            else:
+                time.sleep(delay)
+        return response
+
+    def get_backoff(self, attempt):
+        """第attempt次重试前的等待时间：指数增长，并在后一半区间内随机抖动，避免多个线程同时重试"""
+        delay = min(self.MAX_BACKOFF, self.BACKOFF_FACTOR * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def get_retry_after(self, response):
+        """解析Retry-After响应头（秒数或HTTP日期），没有或无法解析时返回None"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return min(self.MAX_BACKOFF, max(0, float(value)))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return min(self.MAX_BACKOFF, max(0, (retry_at - datetime.now(timezone.utc)).total_seconds()))
+
+    def download(self, url, path, chunk_size=None, resume=True, progress=None, commit=None, **kwargs):
+        """
+        流式下载到文件，按块写入，内存占用与文件大小无关
+
+        数据先写入 path.part，下载完成后再移动到path。.part文件已存在时用Range请求从断点继续，
+        服务端不支持Range（返回200）时从头下载，返回的片段不是从断点开始时删除.part文件重新下载；传输中途连接断开或内容不完整时，按重试次数从断点继续，
+        重试用尽后.part文件保留，下次调用时继续下载。
+
+        Args:
+            url (str): 下载地址
+            path (str): 保存路径
+            chunk_size (int): 每次写入的字节数
+            resume (bool): 是否从已有的.part文件继续下载
+            progress (callable): 每写入一块调用一次，参数为(已下载字节数, 总字节数或None)，如DownloadProgress
+            commit (callable): 把下载完成的.part文件移动到path，参数为(.part路径, path)，默认直接重命名
+            其他参数同requests.Session.request，如params、headers
+
+        Returns:
+            int: 文件大小
+
+        Raises:
+            requests.HTTPError: 服务端返回错误状态码
+            IOError: 重试用尽后内容仍不完整或范围不正确
+        """
+        chunk_size = chunk_size or self.DOWNLOAD_CHUNK_SIZE
+        part_path = f'{path}.part'
+        if not resume and os.path.exists(part_path):
+            os.remove(part_path)
+        # 不接受压缩编码，断点位置和Content-Length都按原始字节计算
+        headers = {'Accept-Encoding': 'identity', **(kwargs.pop('headers', None) or {})}
+
+        for attempt in range(self.max_retries + 1):
+            downloaded = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if downloaded:
+                headers['Range'] = f'bytes={downloaded}-'
+            else:
+                headers.pop('Range', None)
+
+            response = self.request('GET', url, stream=True, headers=headers, **kwargs)
+            try:
+                if response.status_code == 416 and downloaded:
+                    # 断点超出了文件大小，.part文件不可用，从头下载
+                    os.remove(part_path)
+                    continue
+                response.raise_for_status()
+                if response.status_code == 206 and self.get_range_start(response) != downloaded:
+                    # 返回的片段不是从断点开始的，不能拼接到.part文件后面，删除后不带Range从头下载
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    if attempt == self.max_retries:
+                        raise IOError(f"服务端返回的内容范围与断点 {downloaded} 不一致: "
+                                      f"{response.headers.get('Content-Range')}")
+                    continue
+                if response.status_code != 206:
+                    # 服务端忽略了Range，返回的是完整文件
+                    downloaded = 0
+                total = self.get_total_size(response, downloaded)
+                with open(part_path, 'ab' if downloaded else 'wb') as f:
+                    if progress:
+                        progress(downloaded, total)
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+                        downloaded += len(chunk)
+                        if progress:
+                            progress(downloaded, total)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.get_backoff(attempt))
+                continue
+            finally:
+                response.close()
+
+            if total is not None and downloaded < total:
+                if attempt == self.max_retries:
+                    raise IOError(f"下载不完整: {downloaded}/{total} 字节，再次下载时从断点继续")
+                time.sleep(self.get_backoff(attempt))
+                continue
+            (commit or os.replace)(part_path, path)
+            return downloaded
+        raise IOError(f"下载失败: {url}")
+
+    @staticmethod
+    def get_range_start(response):
+        """206响应的Content-Range中的起始位置，如 bytes 100-199/200 -> 100"""
+        try:
+            return int(response.headers['Content-Range'].split()[1].split('-')[0])
+        except (KeyError, IndexError, ValueError):
+            return None
+
+    @staticmethod
+    def get_total_size(response, offset):
+        """文件总大小，服务端没有给出时返回None"""
+        if response.status_code == 206:
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            return int(total) if total.isdigit() else None
+        length = response.headers.get('Content-Length')
+        return offset + int(length) if length and length.isdigit() else None
+
+    def get(self, url, **kwargs):
+        """发送GET请求"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """发送POST请求"""
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def format_size(size):
+    """把字节数格式化为 B/KB/MB/GB"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GB'
+
+
+class DownloadProgress:
+    """
+    打印下载进度和速度，用作HttpClient.download的progress参数
+    最多每interval秒打印一次，下载完成时再打印一次；速度只统计本次下载的字节，不包括断点之前的部分
+
+    用法：
+        client.download(url, path, progress=DownloadProgress('paper.pdf'))
+    """
+
+    def __init__(self, name, interval=1.0):
+        """
+        Args:
+            name (str): 打印时显示的名称
+            interval (float): 两次打印的最小间隔（秒）
+        """
+        self.name = name
+        self.interval = interval
+        self.start_time = None
+        self.start_bytes = 0
+        self.last_print = 0
+
+    def __call__(self, downloaded, total):
+        now = time.monotonic()
+        if self.start_time is None:
+            self.start_time, self.start_bytes, self.last_print = now, downloaded, now
+            if downloaded:
+                print(f"  {self.name}: 从 {format_size(downloaded)} 处继续下载")
+            return
+        finished = total is not None and downloaded >= total
+        if not finished and now - self.last_print < self.interval:
+            return
+        self.last_print = now
+
+        speed = (downloaded - self.start_bytes) / max(now - self.start_time, 1e-6)
+        if total:
+            size = f"{format_size(downloaded)}/{format_size(total)} ({downloaded / total:.0%})"
+        else:
+            size = format_size(downloaded)
+        print(f"  {self.name}: {size}，{format_size(speed)}/s")
@@ -0,0 +1,237 @@
+"""基于SQLite的HTTP响应缓存"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+# 获取当前文件所在的目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class CachedEntry:
+    """缓存中的一条响应"""
+
+    def __init__(self, key, url, status, headers, body, etag, last_modified, stored_at):
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    def is_fresh(self, ttl):
+        """是否还在有效期内，有效期内直接使用缓存，不再访问网络"""
+        return time.time() - self.stored_at < ttl
+
+    def conditional_headers(self):
+        """生成条件请求头，服务端内容没变时会返回304"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        """还原成requests.Response，调用方可以和普通响应一样使用"""
+        response = requests.Response()
+        response.status_code = self.status
+        response.reason = 'OK'
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = self.body
+        response.from_cache = True
+        return response
+
+
+class HttpCache:
+    """
+    HTTP响应的磁盘缓存
+    响应体按SHA-256内容寻址存储，相同内容只存一份；响应元数据按 方法+URL 索引，
+    并记录响应Vary头涉及的请求头取值，请求头不一致时视为未命中。
+
+    - 有效期(ttl)内的缓存直接返回，不访问网络；
+    - 过期后带上ETag/Last-Modified发送条件请求，服务端返回304时继续使用缓存；
+    - 超过max_age未更新的条目，以及总大小超过max_size时最久未访问的条目会被清理。
+
+    用法：
+        client = HttpClient(cache=HttpCache())
+    """
+    DEFAULT_PATH = os.path.join(current_dir + '/../', '.http_cache.sqlite')
+    # 缓存有效期（秒）
+    DEFAULT_TTL = 24 * 3600
+    # 条目最长保留时间（秒）
+    DEFAULT_MAX_AGE = 30 * 24 * 3600
+    # 响应体总大小上限（字节）
+    DEFAULT_MAX_SIZE = 500 * 1024 * 1024
+    # 每写入多少条检查一次是否需要清理
+    EVICT_INTERVAL = 50
+    # 这些响应头描述的是传输时的编码，缓存的是解码后的内容，不能保留
+    SKIPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+    def __init__(self, path=None, ttl=None, max_age=None, max_size=None):
+        """
+        Args:
+            path (str): SQLite数据库文件路径
+            ttl (float): 缓存有效期（秒）
+            max_age (float): 条目最长保留时间（秒）
+            max_size (int): 响应体总大小上限（字节）
+        """
+        self.path = path or self.DEFAULT_PATH
+        self.ttl = self.DEFAULT_TTL if ttl is None else ttl
+        self.max_age = max_age or self.DEFAULT_MAX_AGE
+        self.max_size = max_size or self.DEFAULT_MAX_SIZE
+        self.lock = threading.Lock()
+        self.store_count = 0
+
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                vary TEXT NOT NULL,
+                body_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bodies (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL
+            );
+        ''')
+        self.evict()
+
+    @staticmethod
+    def make_key(method, url):
+        """生成缓存键"""
+        return hashlib.sha256(f'{method.upper()} {url}'.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def vary_values(vary, request_headers):
+        """取出Vary中列出的请求头的值"""
+        request_headers = CaseInsensitiveDict(request_headers or {})
+        return {name: request_headers.get(name) for name in vary}
+
+    def lookup(self, method, url, request_headers=None):
+        """
+        查找缓存
+
+        Returns:
+            CachedEntry or None: 命中的缓存条目（可能已过期，需要调用方判断），未命中返回None
+        """
+        key = self.make_key(method, url)
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT r.status, r.headers, r.vary, r.etag, r.last_modified, r.stored_at, b.data
+                FROM responses r JOIN bodies b ON r.body_hash = b.hash
+                WHERE r.key = ?
+            ''', (key,)).fetchone()
+            if row is None:
+                return None
+            status, headers, vary, etag, last_modified, stored_at, body = row
+            vary = json.loads(vary)
+            if vary != self.vary_values(vary, request_headers):
+                return None
+            self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self.conn.commit()
+        return CachedEntry(key, url, status, json.loads(headers), body, etag, last_modified, stored_at)
+
+    def store(self, method, url, request_headers, response):
+        """
+        保存响应，只缓存200响应，服务端声明no-store的不缓存
+        """
+        if response.status_code != 200:
+            return
+        if 'no-store' in response.headers.get('Cache-Control', '').lower():
+            return
+
+        body = response.content
+        body_hash = hashlib.sha256(body).hexdigest()
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in self.SKIPPED_HEADERS}
+        vary_names = [name.strip() for name in response.headers.get('Vary', '').split(',')
+                      if name.strip() and name.strip() != '*']
+        vary = self.vary_values(vary_names, request_headers)
+        now = time.time()
+
+        with self.lock:
+            self.conn.execute('INSERT OR IGNORE INTO bodies (hash, data, size) VALUES (?, ?, ?)',
+                              (body_hash, body, len(body)))
+            self.conn.execute('''
+                INSERT OR REPLACE INTO responses
+                (key, url, status, headers, vary, body_hash, etag, last_modified, stored_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (self.make_key(method, url), url, response.status_code, json.dumps(headers), json.dumps(vary),
+                  body_hash, response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now))
+            self.conn.commit()
+            self.store_count += 1
+            need_evict = self.store_count % self.EVICT_INTERVAL == 0
+        if need_evict:
+            self.evict()
+
+    def refresh(self, entry, response):
+        """
+        服务端返回304，内容未变：更新有效期和验证信息
+        """
+        etag = response.headers.get('ETag') or entry.etag
+        last_modified = response.headers.get('Last-Modified') or entry.last_modified
+        now = time.time()
+        with self.lock:
+            self.conn.execute('''
+                UPDATE responses SET etag = ?, last_modified = ?, stored_at = ?, accessed_at = ?
+                WHERE key = ?
+            ''', (etag, last_modified, now, now, entry.key))
+            self.conn.commit()
+        entry.etag = etag
+        entry.last_modified = last_modified
+        entry.stored_at = now
+
+    def evict(self):
+        """清理过期条目，总大小超限时按最久未访问的顺序删除，最后删除无人引用的响应体"""
+        with self.lock:
+            self.conn.execute('DELETE FROM responses WHERE stored_at < ?', (time.time() - self.max_age,))
+            self.conn.execute('DELETE FROM bodies WHERE hash NOT IN (SELECT body_hash FROM responses)')
+
+            total_size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+            if total_size > self.max_size:
+                rows = self.conn.execute('''
+                    SELECT r.key, r.body_hash, b.size
+                    FROM responses r JOIN bodies b ON r.body_hash = b.hash
+                    ORDER BY r.accessed_at
+                ''').fetchall()
+                evicted_hashes = set()
+                for key, body_hash, size in rows:
+                    if total_size <= self.max_size:
+                        break
+                    self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    # 同一响应体可能被多条响应引用，只在第一次删除时计入释放的空间
+                    if body_hash not in evicted_hashes:
+                        evicted_hashes.add(body_hash)
+                        total_size -= size
+                self.conn.execute('DELETE FROM bodies WHERE hash NOT IN (SELECT body_hash FROM responses)')
+            self.conn.commit()
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.conn.execute('DELETE FROM responses')
+            self.conn.execute('DELETE FROM bodies')
+            self.conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
@@ -0,0 +1,175 @@
+"""异步分页抓取引擎"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.http import HttpClient
+from utils.rate_limit import RateLimiter
+
+
+class PageCrawler:
+    """
+    并发抓取分页列表
+    请求和解析在线程池中执行，由asyncio调度：同时最多concurrency个页面在途，
+    每个请求发出前都要从令牌桶拿到令牌，因此总速率不会超过rate_limiter的设置；
+    服务端返回429/503时由HttpClient退避重试，并降低该主机的速率。
+
+    总页数的确定方式：
+    - 传入find_last_page时，用它从第一页的响应中解析出最后一页的页码，然后并发抓取其余页面；
+    - 否则按窗口向后抓取，遇到没有数据的页面后不再调度更后面的页。请求失败的页面不会结束抓取，
+      只有最后一个成功页面之后连续concurrency个页面都失败时才停止调度（避免服务端对超出范围的页码报错时无限抓取）。
+
+    请求失败的页面记录在failed_pages中（真正的最后一页之后的失败不算），抓取结束后complete为False，
+    调用方据此区分完整的结果和中途出错、不完整的结果。
+
+    传入load_local_page时，本地已有数据的页面（如上次中断前已保存的页面）直接使用本地数据，不再请求。
+
+    用法：
+        crawler = PageCrawler(
+            url_for_page=lambda page: f'https://example.com/list?page={page}',
+            parse_page=lambda response, page: [...],
+        )
+        # 按页码顺序返回所有数据
+        rows = crawler.run()
+
+        # 或在协程中边抓边处理，页面完成的顺序不固定
+        async for page, rows in crawler.crawl():
+            ...
+    """
+    DEFAULT_CONCURRENCY = 4
+
+    def __init__(self, url_for_page, parse_page, find_last_page=None, client=None, rate_limiter=None,
+                 concurrency=None, first_page=1, max_pages=None, load_local_page=None):
+        """
+        Args:
+            url_for_page (callable): 根据页码生成URL的函数
+            parse_page (callable): 解析响应，参数为(requests.Response, 页码)，返回该页数据列表
+            find_last_page (callable): 从第一页的响应中解析最后一页页码的函数，返回None表示未知
+            client (HttpClient): 发送请求用的客户端，请求使用PageCrawler的rate_limiter限速和退避
+            rate_limiter (RateLimiter): 按主机限速，默认使用RateLimiter的默认速率
+            concurrency (int): 同时在途的页面数
+            first_page (int): 第一页的页码，有的接口从0开始
+            max_pages (int): 最多抓取的页数
+            load_local_page (callable): 参数为页码，返回本地已有的该页数据列表，返回None时才请求该页
+        """
+        self.url_for_page = url_for_page
+        self.parse_page = parse_page
+        self.find_last_page = find_last_page
+        self.concurrency = concurrency or self.DEFAULT_CONCURRENCY
+        self.client = client or HttpClient(pool_maxsize=self.concurrency)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.first_page = first_page
+        self.max_pages = max_pages
+        self.load_local_page = load_local_page
+        # 抓取失败的页码及原因
+        self.failed_pages = {}
+        # 上次抓取是否完整：到达了最后一页，且没有失败的页面
+        self.complete = False
+
+    def load_page(self, page):
+        """在工作线程中请求并解析单页，返回(数据列表, 最后一页页码)"""
+        # 令牌已经在协程中异步拿过了；如果缓存在这期间过期，重新请求时也不会再等待，影响可以忽略
+        response = self.client.get(self.url_for_page(page), rate_limiter=self.rate_limiter, acquired=True)
+        response.raise_for_status()
+        rows = self.parse_page(response, page)
+        last_page = None
+        if page == self.first_page and self.find_last_page:
+            last_page = self.find_last_page(response)
+        return rows, last_page
+
+    async def fetch_page(self, page, loop, executor, semaphore):
+        """限速后抓取单页，返回(页码, 数据列表, 最后一页页码)，失败时记录到failed_pages，数据列表为None"""
+        if self.load_local_page:
+            rows = self.load_local_page(page)
+            if rows is not None:
+                # 本地数据中没有分页信息，总页数未知时按窗口继续向后抓取
+                return page, rows, None
+        async with semaphore:
+            url = self.url_for_page(page)
+            # 能直接从缓存返回的页面不占用令牌
+            if not self.client.has_fresh_cache(url):
+                await self.rate_limiter.acquire_async(url)
+            try:
+                rows, last_page = await loop.run_in_executor(executor, self.load_page, page)
+                return page, rows, last_page
+            except Exception as e:
+                print(f"抓取第 {page} 页时出错: {e}")
+                self.failed_pages[page] = e
+                return page, None, None
+
+    async def crawl(self):
+        """
+        并发抓取所有页面，每完成一页就产出 (页码, 数据列表)
+        """
+        self.failed_pages = {}
+        self.complete = False
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limit_page = self.first_page + self.max_pages - 1 if self.max_pages else None
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            page, rows, last_page = await self.fetch_page(self.first_page, loop, executor, semaphore)
+            if not rows:
+                self.complete = rows is not None
+                return
+            yield page, rows
+
+            if last_page is not None:
+                if limit_page is not None:
+                    last_page = min(last_page, limit_page)
+                tasks = [
+                    asyncio.ensure_future(self.fetch_page(p, loop, executor, semaphore))
+                    for p in range(self.first_page + 1, last_page + 1)
+                ]
+                for task in asyncio.as_completed(tasks):
+                    page, rows, _ = await task
+                    if rows:
+                        yield page, rows
+                self.complete = not self.failed_pages
+                return
+
+            # 总页数未知：保持concurrency个页面在途，遇到空页后不再调度更后面的页；
+            # 请求失败的页面不代表结束，继续向后抓取
+            next_page = self.first_page + 1
+            stop_page = None
+            last_success = self.first_page
+            gave_up = False
+            pending = set()
+            while True:
+                while (len(pending) < self.concurrency
+                       and not gave_up
+                       and (stop_page is None or next_page < stop_page)
+                       and (limit_page is None or next_page <= limit_page)):
+                    pending.add(asyncio.ensure_future(self.fetch_page(next_page, loop, executor, semaphore)))
+                    next_page += 1
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t.result()[0]):
+                    page, rows, _ = task.result()
+                    if rows is None:
+                        continue
+                    if not rows:
+                        stop_page = page if stop_page is None else min(stop_page, page)
+                    elif stop_page is None or page < stop_page:
+                        last_success = max(last_success, page)
+                        yield page, rows
+                if stop_page is None and not gave_up:
+                    # 最后一个成功页面之后连续一整个窗口都失败，无法判断是否已经到达末尾，停止调度
+                    gave_up = sum(1 for failed in self.failed_pages if failed > last_success) >= self.concurrency
+
+            if stop_page is not None:
+                # 真正的最后一页之后的页面本来就没有数据，它们的失败不影响结果
+                self.failed_pages = {page: e for page, e in self.failed_pages.items() if page < stop_page}
+            reached_end = stop_page is not None or (not gave_up and limit_page is not None and next_page > limit_page)
+            self.complete = reached_end and not self.failed_pages
+
+    async def collect(self):
+        """抓取所有页面，按页码顺序合并数据，结果是否完整见complete和failed_pages"""
+        pages = {}
+        async for page, rows in self.crawl():
+            pages[page] = rows
+        return [row for page in sorted(pages) for row in pages[page]]
+
+    def run(self):
+        """同步入口，按页码顺序返回所有数据"""
+        return asyncio.run(self.collect())
@@ -38,3 +38,13 @@ class ProxyHandler:
         opener = urllib.request.build_opener(proxy)
         urllib.request.install_opener(opener)
         return urllib
+
+    def get_proxies(self, http_type='http'):
+        """
+        获取requests格式的代理配置
+        注意，http_type可以是http或https，需要和实际请求的网址的协议一致
+
+        该方法返回的是字典，可以直接传给HttpClient：
+            client = HttpClient(proxies=proxy_handler.get_proxies('https'))
+        """
+        return {http_type: f'http://{self.PROXY_IP}:{self.PROXY_PORT}'}
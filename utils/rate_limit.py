@@ -0,0 +1,139 @@
+"""按主机限速的令牌桶"""
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    令牌桶
+    以每秒rate个的速度补充令牌，最多积攒capacity个，每个请求消耗一个令牌。
+    令牌不足时允许"透支"，透支的请求按顺序排队等待，保证多线程下总速率不超过rate。
+
+    速率是自适应的：服务端返回429/503时调用slow_down()，速率减半并暂停一段时间；
+    之后每次请求成功调用speed_up()，速率逐步恢复到设定的max_rate。
+    """
+    # 自适应降速时最低降到max_rate的几分之一
+    MIN_RATE_DIVISOR = 16
+    # 每次成功后速率恢复max_rate的几分之一
+    SPEED_UP_STEP = 0.1
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): 每秒补充的令牌数，即稳定状态下每秒允许的请求数
+            capacity (float): 桶容量，即允许的突发请求数，默认与rate相同（至少为1）
+        """
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = rate / self.MIN_RATE_DIVISOR
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        """按流逝的时间补充令牌，调用方需持有锁"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self):
+        """
+        预订一个令牌
+
+        Returns:
+            float: 拿到令牌前还需要等待的秒数，0表示可以立即发送请求
+        """
+        with self.lock:
+            self.refill()
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def slow_down(self, delay):
+        """
+        服务端要求降速：速率减半，并且至少delay秒内不再发放令牌
+
+        Args:
+            delay (float): 暂停的秒数，通常来自Retry-After或指数退避
+        """
+        with self.lock:
+            self.refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, -delay * self.rate)
+
+    def speed_up(self):
+        """请求成功，速率向max_rate恢复一步"""
+        if self.rate >= self.max_rate:
+            return
+        with self.lock:
+            self.refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.SPEED_UP_STEP)
+
+
+class RateLimiter:
+    """
+    按主机分别限速
+    每个主机(host:port)一个令牌桶，不同主机之间互不影响。
+
+    用法：
+        limiter = RateLimiter(rate=5)
+        limiter.acquire('https://example.com/page/1')
+    """
+    DEFAULT_RATE = 5
+
+    def __init__(self, rate=None, capacity=None, host_rates=None):
+        """
+        Args:
+            rate (float): 每个主机默认每秒允许的请求数
+            capacity (float): 每个主机默认允许的突发请求数
+            host_rates (dict): 为特定主机单独设置的速率，如 {'fanyi.youdao.com': 1}
+        """
+        self.rate = rate or self.DEFAULT_RATE
+        self.capacity = capacity
+        self.host_rates = host_rates or {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_host(url):
+        """从URL中提取主机名，传入的不是URL时原样返回"""
+        return urlparse(url).netloc or url
+
+    def get_bucket(self, url):
+        """获取URL所属主机的令牌桶，不存在则创建"""
+        host = self.get_host(url)
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                rate = self.host_rates.get(host, self.rate)
+                bucket = TokenBucket(rate, self.capacity)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        """阻塞直到URL所属主机允许发送下一个请求"""
+        self.get_bucket(url).acquire()
+
+    async def acquire_async(self, url):
+        """协程版本的acquire，等待期间不阻塞事件循环"""
+        wait = self.get_bucket(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def backoff(self, url, delay):
+        """URL所属主机返回了429/503，降低该主机的速率并暂停delay秒"""
+        self.get_bucket(url).slow_down(delay)
+
+    def record_success(self, url):
+        """URL所属主机的请求成功，逐步恢复速率"""
+        self.get_bucket(url).speed_up()
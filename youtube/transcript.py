@@ -2,8 +2,13 @@
 根据YouTube视频ID，获取字幕
 '''
 # https://github.com/jdepoix/youtube-transcript-api
-import time
+import youtube_transcript_api
 from youtube_transcript_api import YouTubeTranscriptApi
+from utils.rate_limit import RateLimiter
+
+# 字幕接口的请求频率，youtube_transcript_api自己发请求，这里只控制调用节奏
+TRANSCRIPT_HOST = 'www.youtube.com'
+rate_limiter = RateLimiter(rate=1)
 
 
 def get_caption(video_id):
@@ -26,13 +31,18 @@ if __name__ == "__main__":
     for video in videos:
         # 添加异常捕获，保证报错不会中断循环
         try:
-            # 将内容写入本地文件，并且文件名为视频ID；如果文件不存在则自动创建
+            # 按令牌桶控制请求频率，防止频繁请求
+            rate_limiter.acquire(TRANSCRIPT_HOST)
 
+            # 将内容写入本地文件，并且文件名为视频ID；如果文件不存在则自动创建
             with open(f'youtube/data/subtitle/{video}.txt', 'w', encoding='utf-8') as f:
                 f.write(get_caption(video))
-            # 暂停100秒，防止频繁请求
-            time.sleep(1)
 
+        except youtube_transcript_api.TooManyRequests as e:
+            # 被限流时降低速率并暂停一段时间
+            print(f'Error: {e}')
+            rate_limiter.backoff(TRANSCRIPT_HOST, 60)
+            continue
         except (youtube_transcript_api.CouldNotRetrieveTranscript, youtube_transcript_api.NoTranscriptFound) as e:
             print(f'Error: {e}')
             continue
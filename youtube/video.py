@@ -9,6 +9,7 @@ import json
 
 
 from utils.config_parser import ConfigParser
+from utils.http import HttpClient
 from utils.proxy import ProxyHandler
 
 parser = ConfigParser()
@@ -17,9 +18,9 @@ config_data = parser.read_config()
 # 获取API密钥
 API_KEY = parser.get_option('google_developer', 'api_key')
 
-# 设置代理信息
+# 设置代理信息，所有API请求共用一个客户端，复用到googleapis的连接
 proxy_handler = ProxyHandler()
-urllib = proxy_handler.set_http_proxy('https')
+http_client = HttpClient(proxies=proxy_handler.get_proxies('https'))
 
 
 def get_video_info(video_id):
@@ -30,12 +31,9 @@ def get_video_info(video_id):
         'id': video_id,
         'key': API_KEY
     }
-    query_string = urllib.parse.urlencode(params)
-    url = f'{base_url}?{query_string}'
-    req = urllib.request.Request(url)
-    with urllib.request.urlopen(req, timeout=10) as response:
-        data = response.read()
-        return data.decode('utf-8')
+    response = http_client.get(base_url, params=params)
+    response.raise_for_status()
+    return response.content.decode('utf-8')
 
 # 测试
 # video_id = 'Alpyf1nq6HM'
@@ -54,12 +52,9 @@ def get_playlist_items(playlist_id):
         # 'pageToken': 'EAAajQFQVDpDR1FpRURjNE1EWXdOVUpETmpsRE5rTXlOVEFvQVVqRTZJcTlqNlNGQTFBQldrUWlRMmxLVVZSSGNFbFJNVkpRVm5wV2RtRnVTbXhaTUZKSFkydzVUbVI2V1RKWGEzQkZaVlZuZVU5VWJGUlZia1pMUldkelNYSndTM2h6UVZsUmIweDFXRVZSSWc',
         'key': API_KEY
     }
-    query_string = urllib.parse.urlencode(params)
-    url = f'{base_url}?{query_string}'
-    req = urllib.request.Request(url)
-    with urllib.request.urlopen(req, timeout=10) as response:
-        data = response.read()
-        return data.decode('utf-8')
+    response = http_client.get(base_url, params=params)
+    response.raise_for_status()
+    return response.content.decode('utf-8')
 
 
 # VIS Full Papers - Presentations | VIS 2023
@@ -81,12 +76,9 @@ def get_caption_info(video_id):
         'videoId': video_id,
         'key': API_KEY
     }
-    query_string = urllib.parse.urlencode(params)
-    url = f'{base_url}?{query_string}'
-    req = urllib.request.Request(url)
-    with urllib.request.urlopen(req, timeout=10) as response:
-        data = response.read()
-        return data.decode('utf-8')
+    response = http_client.get(base_url, params=params)
+    response.raise_for_status()
+    return response.content.decode('utf-8')
 
 
 # 下载视频的字幕，并写入本地文件
@@ -110,15 +102,13 @@ def download_caption(caption_id, caption_file_path):
         'id': caption_id,
         'key': API_KEY
     }
-    query_string = urllib.parse.urlencode(params)
-    url = f'{base_url}/{caption_id}?{query_string}'
-    print(url)
-    req = urllib.request.Request(url)
-    with urllib.request.urlopen(req, timeout=10) as response:
-        data = response.read()
-        with open(f'{caption_file_path}', 'wb') as f:
-            f.write(data)
-        return data.decode('utf-8')
+    url = f'{base_url}/{caption_id}'
+    # 打印完整的请求地址，去掉其中的API key
+    print(HttpClient.build_url(url, {key: value for key, value in params.items() if key != 'key'}))
+    # 流式写入文件，中断后再次下载时从断点继续
+    http_client.download(url, caption_file_path, params=params)
+    with open(caption_file_path, 'r', encoding='utf-8') as f:
+        return f.read()
 
 
 # caption_id = 'AUieDaYRJ2P1LGmAVxqrVvjQh1qSDE0fHyidpBwHNJ_6GvNRrDc'